@@ -16,15 +16,15 @@ snr = 20
 
 # Get the catalogs.
 loader = FilteredLoader("../filtered")
-lc_df = loader.get_lc(tile, snr)
+lc_index = loader.get_star_index(tile, snr)
 feature_df = loader.get_features(tile, snr)
 
-tile_id = lc_df["id"].unique()
+tile_id = lc_index.ids
 batch_id = np.array_split(tile_id, n_batch)
 tile_id = batch_id[batch_idx]
 
 chunk_id = np.array_split(tile_id, n_jobs)
-lc_chunks = [lc_df[lc_df["id"].isin(ids)] for ids in chunk_id]
+lc_chunks = [lc_index.select(ids) for ids in chunk_id]
 f_chunks = [feature_df[feature_df["id"].isin(ids)] for ids in chunk_id]
 augmented_list = []
 
@@ -32,7 +32,7 @@ lc = lc_chunks[0]
 f = f_chunks[0]
 
 for _, star in f.iterrows():
-    light_curve = lc.loc[lc["id"] == star.id]
+    light_curve = lc.get_star(star.id)
     light_curve = LightCurve(light_curve, star.PeriodLS, star.id, GeorgeGPWrapper())
 
     for _ in range(n_iter):
@@ -1,9 +1,24 @@
 from pandas import read_csv
 
+from catalog.star_index import StarIndex
+from catalog.tile_cache import cached
+from catalog.tile_store import (
+    DEFAULT_BATCH_ROWS,
+    compact_dtype,
+    compact_table,
+    iter_csv_table,
+    iter_star_batches,
+    memory_saved,
+    prefetch_tiles,
+)
+
 
 class AugmentedLoader:
-    def __init__(self, path, gp_lib, snr, n_synth):
+    def __init__(self, path, gp_lib, snr, n_synth, compact=False, cache=None):
         self.path = path
+        self.compact = compact
+        self.cache = cache
+        self.memory_report = {}
         self.gp_lib = gp_lib
         self.snr = snr
         self.n_synth = n_synth
@@ -90,16 +105,89 @@ class AugmentedLoader:
             "b396",
         ]
 
+    def _lc_filename(self, tile):
+        return f"{self.path}/augmented_{tile}_{self.gp_lib}_lc_snr{self.snr}_synth{self.n_synth}.csv"
+
     def get_lc(self, tile):
-        return read_csv(
-            f"{self.path}/augmented_{tile}_{self.gp_lib}_lc_snr{self.snr}_synth{self.n_synth}.csv",
+        filename = self._lc_filename(tile)
+        return cached(
+            self.cache,
+            filename,
+            ("lc",),
+            lambda: read_csv(filename, dtype=self._lc_dtype),
+        )
+
+    def iter_lc(self, tile, batch_stars=None, batch_rows=DEFAULT_BATCH_ROWS):
+        """
+        Yields the observations of a tile in batches of complete stars, with at
+        most batch_stars stars per batch. The file is read batch_rows rows at a
+        time, so the whole tile is never in memory.
+        """
+        chunks = iter_csv_table(
+            self._lc_filename(tile),
             dtype=self._lc_dtype,
+            batch_rows=batch_rows,
         )
+        return iter_star_batches(chunks, batch_stars)
+
+    def get_star_index(self, tile):
+        """Returns the observations of a tile as a StarIndex."""
+        return StarIndex.from_dataframe(
+            self.get_lc(tile), columns=("hjd", "mag", "err", "synthetic")
+        )
+
+    def star_store_path(self, tile):
+        return f"{self.path}/augmented_{tile}_{self.gp_lib}_lc_snr{self.snr}_synth{self.n_synth}_store"
+
+    def write_star_store(self, tile):
+        """Writes the observations of a tile as a memory-mappable StarIndex."""
+        path = self.star_store_path(tile)
+        self.get_star_index(tile).save(path, source=self._lc_filename(tile))
+        return path
+
+    def update_star_store(self, tile):
+        """
+        Returns the path of the StarIndex store of a tile, writing it if it is
+        missing or older than the observations file.
+        """
+        path = self.star_store_path(tile)
+        if not StarIndex.is_current(path, self._lc_filename(tile)):
+            self.write_star_store(tile)
+        return path
+
+    def open_star_store(self, tile, mmap_mode="r"):
+        return StarIndex.load(self.star_store_path(tile), mmap_mode=mmap_mode)
 
     def get_features(self, tile):
-        return read_csv(
-            f"{self.path}/augmented_{tile}_{self.gp_lib}_features_snr{self.snr}_synth{self.n_synth}.csv",
-            dtype=self._features_dtype,
+        name = (
+            f"augmented_{tile}_{self.gp_lib}_features_snr{self.snr}_synth{self.n_synth}"
+        )
+        return cached(
+            self.cache,
+            f"{self.path}/{name}.csv",
+            ("features", self.compact),
+            lambda: self._read_features(name),
+        )
+
+    def _read_features(self, name):
+        if not self.compact:
+            return read_csv(f"{self.path}/{name}.csv", dtype=self._features_dtype)
+
+        # Narrow the dtypes and record the memory saved in memory_report.
+        df = read_csv(
+            f"{self.path}/{name}.csv", dtype=compact_dtype(self._features_dtype)
+        )
+        df = compact_table(df, self._features_dtype)
+        self.memory_report[name] = memory_saved(df, self._features_dtype)
+        return df
+
+    def iter_tiles(self, method, tiles=None, max_in_flight=2, **kwargs):
+        """
+        Yields (tile, result) calling the given loader method (e.g. "get_features")
+        on every tile, loading the next ones in the background. See prefetch_tiles.
+        """
+        return prefetch_tiles(
+            getattr(self, method), tiles or self._tiles, max_in_flight, **kwargs
         )
 
     def list_tiles(self):
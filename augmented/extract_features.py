@@ -8,6 +8,9 @@ import sys
 from joblib import Parallel, delayed
 
 from augmented.augmented_loader import AugmentedLoader
+from augmented.feature_extraction import generate_features, write_retry_list
+from augmented.validation import reason_counts, validate_stars
+from catalog.star_index import StarIndex
 from filtered.filtered_loader import FilteredLoader
 
 # Parameters.
@@ -18,30 +21,10 @@ n_synth = int(sys.argv[1])
 n_jobs = 32
 start_idx = int(sys.argv[2])
 end_idx = int(sys.argv[3])
-
-
-def generate_features(lc, features, fs):
-    features_list = []
-    for _, star in features.iterrows():
-        try:
-            star_lc = lc.loc[lc["id"] == star.id]
-            names, values = fs.extract(
-                star_lc["hjd"].values, star_lc["mag"].values, star_lc["err"].values
-            )
-            lc_dict = dict(zip(names, values))
-            lc_dict["id"] = [star.id]
-            lc_dict["rrlyr"] = star.rrlyr
-
-            star_df = pd.DataFrame.from_dict(lc_dict)
-            features_list.append(star_df)
-        except RuntimeError:
-            print(f"Caught RuntimeError with star id: {star.id}")
-        except ZeroDivisionError:
-            print(f"Caught ZeroDivisonError with star id: {star.id}")
-        except IndexError:
-            print(f"Caught IndexError with star id: {star.id}")
-    return pd.concat(features_list)
-
+# Wall-clock seconds a star may take before it is skipped and left for a retry.
+max_seconds = 120
+# Features already extracted from the same light curves, None to disable.
+cache_path = "../cache/features.sqlite"
 
 filtered_loader = FilteredLoader("../filtered")
 augmented_loader = AugmentedLoader(".", gp_lib, snr, n_synth)
@@ -107,26 +90,45 @@ rr_lyrae = ["RRLyr-RRab", "RRLyr-RRc", "RRLyr-RRd"]
 
 tile_features = filtered_loader.get_features(tile, snr)
 tile_features = tile_features.assign(rrlyr=tile_features["vs_type"].isin(rr_lyrae))
-tile_lc = augmented_loader.get_lc(tile)
 
-tile_id = tile_lc["id"].unique()[start_idx:end_idx]
+# Write the observations once as a memory-mapped store instead of pickling a
+# chunk of the tile for every worker.
+store = augmented_loader.update_star_store(tile)
+tile_lc = StarIndex.load(store, mmap_mode="r")
+
+# Leave out the stars the extractors would fail on before running them.
+validation = validate_stars(tile_lc)
+
+tile_id = tile_lc.ids[start_idx:end_idx]
+rejected = validation[validation["id"].isin(tile_id) & validation["reason"].notna()]
+print(reason_counts(rejected).to_string())
+rejected.to_csv(
+    f"rejected_{tile}_{gp_lib}_snr{snr}_synth{n_synth}{start_idx}.csv",
+    index=False,
+)
+tile_id = tile_id[~np.isin(tile_id, rejected["id"])]
 chunk_id = np.array_split(tile_id, n_jobs)
-lc_chunks = [tile_lc[tile_lc["id"].isin(ids)] for ids in chunk_id]
 f_chunks = [tile_features[tile_features["id"].isin(ids)] for ids in chunk_id]
 fs_list = [feets.FeatureSpace(only=columns)] * n_jobs
 
 del tile_features
 del tile_lc
+del validation
 del tile_id
 del chunk_id
 gc.collect()
 
-features_list = Parallel(n_jobs=n_jobs)(
-    delayed(generate_features)(lc_chunk, f_chunk, fs)
-    for lc_chunk, f_chunk, fs in zip(lc_chunks, f_chunks, fs_list)
+results = Parallel(n_jobs=n_jobs)(
+    delayed(generate_features)(store, f_chunk, fs, max_seconds, cache_path)
+    for f_chunk, fs in zip(f_chunks, fs_list)
 )
 
-features_df = pd.concat(features_list)
+features_df = pd.concat([features for features, _ in results])
+retry_ids = [id for _, chunk_retry_ids in results for id in chunk_retry_ids]
+write_retry_list(
+    retry_ids,
+    f"retry_{tile}_{gp_lib}_snr{snr}_synth{n_synth}{start_idx}.csv",
+)
 features_df.to_csv(
     f"augmented_{tile}_{gp_lib}_features_snr{snr}_synth{n_synth}{start_idx}.csv",
     index=False,
@@ -0,0 +1,138 @@
+import hashlib
+import numpy as np
+import os
+import pickle
+import sqlite3
+import time
+
+from functools import lru_cache
+
+# =============================================================================
+# CONSTANTS
+# =============================================================================
+
+DEFAULT_MAX_BYTES = 2_000_000_000
+
+# SQLite limits the number of parameters of a query.
+_QUERY_SIZE = 900
+
+
+# =============================================================================
+# FUNCTIONS
+# =============================================================================
+
+
+@lru_cache(maxsize=None)
+def extraction_version():
+    """
+    Returns the version of the feature extraction code, the feets version plus
+    a hash of light_curve/feets_patch.py, so cached features are invalidated
+    when the extractors change.
+    """
+    import feets
+    import light_curve.feets_patch
+
+    with open(light_curve.feets_patch.__file__, "rb") as file:
+        patch_hash = hashlib.sha1(file.read()).hexdigest()
+    return f"feets-{feets.VERSION}-patch-{patch_hash}"
+
+
+def feature_key(hjd, mag, err, fs):
+    """
+    Returns the cache key of the features of fs (a FeatureSpace) for the
+    given light curve.
+    """
+    key = hashlib.sha1()
+    for values in (hjd, mag, err):
+        values = np.ascontiguousarray(values, dtype=np.float64).ravel()
+        key.update(len(values).to_bytes(8, "little"))
+        key.update(values.tobytes())
+    key.update(repr(list(fs.features_as_array_)).encode())
+    key.update(repr(sorted(fs.kwargs.items())).encode())
+    key.update(extraction_version().encode())
+    return key.hexdigest()
+
+
+# =============================================================================
+# FEATURE CACHE CLASS
+# =============================================================================
+
+
+class FeatureCache:
+    """
+    A persistent cache of extracted features in an SQLite file, keyed by
+    feature_key, so unchanged light curves are not extracted again in later
+    runs. Entries are evicted in least recently used order once they take more
+    than max_bytes. Every process must open its own FeatureCache.
+    """
+
+    def __init__(self, filename, max_bytes=DEFAULT_MAX_BYTES):
+        self.filename = filename
+        self.max_bytes = max_bytes
+        os.makedirs(os.path.dirname(os.path.abspath(filename)), exist_ok=True)
+        # Workers write to the same file, so wait for their locks.
+        self._connection = sqlite3.connect(filename, timeout=600)
+        with self._connection:
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS features ("
+                "key TEXT PRIMARY KEY, value BLOB, size INTEGER, last_used REAL)"
+            )
+            self._connection.execute(
+                "CREATE INDEX IF NOT EXISTS last_used ON features (last_used)"
+            )
+
+    def get_many(self, keys):
+        """Returns a dict with the (names, values) of the keys in the cache."""
+        keys = list(keys)
+        found = {}
+        for start in range(0, len(keys), _QUERY_SIZE):
+            batch = keys[start : start + _QUERY_SIZE]
+            placeholders = ",".join("?" * len(batch))
+            rows = self._connection.execute(
+                f"SELECT key, value FROM features WHERE key IN ({placeholders})",
+                batch,
+            )
+            found.update((key, pickle.loads(value)) for key, value in rows)
+
+        with self._connection:
+            self._connection.executemany(
+                "UPDATE features SET last_used = ? WHERE key = ?",
+                [(time.time(), key) for key in found],
+            )
+        return found
+
+    def put_many(self, items):
+        """Stores the (names, values) of every key of the items dict."""
+        rows = []
+        for key, (names, values) in items.items():
+            value = pickle.dumps(
+                (list(names), np.asarray(values)), protocol=pickle.HIGHEST_PROTOCOL
+            )
+            rows.append((key, value, len(value), time.time()))
+        with self._connection:
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO features VALUES (?, ?, ?, ?)", rows
+            )
+        self._evict()
+
+    def _evict(self):
+        with self._connection:
+            n_bytes = self._connection.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM features"
+            ).fetchone()[0]
+            if n_bytes <= self.max_bytes:
+                return
+            # Walk the entries from the least recently used one until enough
+            # bytes are freed.
+            freed, evicted = 0, []
+            for key, size in self._connection.execute(
+                "SELECT key, size FROM features ORDER BY last_used"
+            ):
+                if n_bytes - freed <= self.max_bytes:
+                    break
+                freed += size
+                evicted.append((key,))
+            self._connection.executemany("DELETE FROM features WHERE key = ?", evicted)
+
+    def close(self):
+        self._connection.close()
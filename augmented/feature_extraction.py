@@ -0,0 +1,149 @@
+import multiprocessing
+import numpy as np
+import pandas as pd
+
+from augmented.feature_cache import FeatureCache, feature_key
+from catalog.star_index import StarIndex
+
+# Forked processes inherit the FeatureSpace and the patched extractors, and
+# the joblib workers replace the default context with one that cannot start
+# them.
+_CONTEXT = multiprocessing.get_context(
+    "fork" if "fork" in multiprocessing.get_all_start_methods() else "spawn"
+)
+
+
+class TimeLimitError(Exception):
+    pass
+
+
+def _extraction_loop(fs, connection):
+    """Extracts the features of the light curves received from connection."""
+    while True:
+        time, magnitude, error = connection.recv()
+        try:
+            connection.send((None, fs.extract(time, magnitude, error)))
+        except Exception as e:
+            connection.send((e, None))
+
+
+class ExtractionProcess:
+    """
+    Runs fs.extract in a child process, so an extraction that takes more than
+    max_seconds of wall-clock time can be killed, even inside compiled code.
+    The process is then replaced and TimeLimitError raised. Without
+    max_seconds the features are extracted in the calling process.
+    """
+
+    def __init__(self, fs, max_seconds=None):
+        self.fs = fs
+        self.max_seconds = max_seconds
+        self.process = None
+
+    def _start(self):
+        self.connection, child = _CONTEXT.Pipe()
+        self.process = _CONTEXT.Process(
+            target=_extraction_loop, args=(self.fs, child), daemon=True
+        )
+        self.process.start()
+        child.close()
+
+    def _kill(self):
+        self.process.kill()
+        self.process.join()
+        self.connection.close()
+        self.process = None
+
+    def extract(self, time, magnitude, error):
+        if self.max_seconds is None:
+            return self.fs.extract(time, magnitude, error)
+
+        if self.process is None:
+            self._start()
+        self.connection.send((time, magnitude, error))
+        if not self.connection.poll(self.max_seconds):
+            self._kill()
+            raise TimeLimitError(f"Time limit of {self.max_seconds} s exceeded.")
+        try:
+            exception, result = self.connection.recv()
+        except EOFError:
+            self._kill()
+            raise RuntimeError("The extraction process died.")
+        if exception is not None:
+            raise exception
+        return result
+
+    def close(self):
+        if self.process is not None:
+            self._kill()
+
+
+def generate_features(store, features, fs, max_seconds=None, cache_path=None):
+    """
+    Extracts the features of fs for the stars in the features dataframe, with
+    the observations of the StarIndex saved in store. Stars that take more
+    than max_seconds are killed, see ExtractionProcess, and skipped so the
+    worker moves on to the next one.
+    With a cache_path, the features of light curves already extracted are
+    read from that FeatureCache and the new ones are added to it.
+    Returns the features and the ids of the skipped stars, to retry them.
+    """
+    # Memory-mapped, so every worker shares the same pages of the tile.
+    lc = StarIndex.load(store, mmap_mode="r")
+    cache = FeatureCache(cache_path) if cache_path is not None else None
+    keys = {}
+    cached = {}
+    if cache is not None:
+        for star_id in features.id:
+            star_lc = lc.get_star(star_id)
+            keys[star_id] = feature_key(
+                star_lc["hjd"], star_lc["mag"], star_lc["err"], fs
+            )
+        cached = cache.get_many(keys.values())
+
+    features_list = []
+    retry_ids = []
+    extracted = {}
+    extractor = ExtractionProcess(fs, max_seconds)
+    for _, star in features.iterrows():
+        try:
+            if keys.get(star.id) in cached:
+                names, values = cached[keys[star.id]]
+            else:
+                star_lc = lc.get_star(star.id)
+                names, values = extractor.extract(
+                    np.asarray(star_lc["hjd"]),
+                    np.asarray(star_lc["mag"]),
+                    np.asarray(star_lc["err"]),
+                )
+                if cache is not None:
+                    extracted[keys[star.id]] = (names, values)
+            lc_dict = dict(zip(names, values))
+            lc_dict["id"] = [star.id]
+            lc_dict["rrlyr"] = star.rrlyr
+
+            star_df = pd.DataFrame.from_dict(lc_dict)
+            features_list.append(star_df)
+        except RuntimeError:
+            print(f"Caught RuntimeError with star id: {star.id}")
+        except ZeroDivisionError:
+            print(f"Caught ZeroDivisonError with star id: {star.id}")
+        except IndexError:
+            print(f"Caught IndexError with star id: {star.id}")
+        except TimeLimitError:
+            print(f"Caught TimeLimitError with star id: {star.id}")
+            retry_ids.append(star.id)
+    extractor.close()
+
+    if cache is not None:
+        cache.put_many(extracted)
+        cache.close()
+
+    if not features_list:
+        return pd.DataFrame(), retry_ids
+    return pd.concat(features_list), retry_ids
+
+
+def write_retry_list(retry_ids, filename):
+    """Writes the ids of the stars to extract again to a csv file."""
+    pd.DataFrame({"id": retry_ids}, dtype="int64").to_csv(filename, index=False)
@@ -0,0 +1,93 @@
+import numpy as np
+import pandas as pd
+
+from light_curve.periodogram import MAXIMUM_FREQUENCY
+
+# =============================================================================
+# CONSTANTS
+# =============================================================================
+
+# The FluxPercentileRatio features read the sorted magnitudes at index
+# ceil(0.95 N), which is out of range below 20 observations, so the extraction
+# raises IndexError for those stars.
+MIN_OBSERVATIONS = 20
+# A light curve shorter than the shortest searched period has no cycle.
+MIN_BASELINE = 1.0 / MAXIMUM_FREQUENCY
+
+# In the order they are checked, a star is rejected for the first one.
+REASONS = (
+    "non_finite",
+    "too_few_points",
+    "non_positive_error",
+    "duplicate_times",
+    "zero_variance",
+    "short_baseline",
+)
+
+
+# =============================================================================
+# FUNCTIONS
+# =============================================================================
+
+
+def _star_reduce(ufunc, values, offsets, counts):
+    """Applies ufunc.reduceat to the observations of every non-empty star."""
+    result = np.full(len(counts), np.nan)
+    nonempty = counts > 0
+    if nonempty.any():
+        result[nonempty] = ufunc.reduceat(values, offsets[:-1][nonempty])
+    return result
+
+
+def _duplicate_times(hjd, star, n_stars):
+    """Flags the stars with two observations at the same time."""
+    same_star = star[1:] == star[:-1]
+    # The observations are usually sorted, so only sort them if they are not.
+    if not (np.diff(hjd)[same_star] > 0).all():
+        order = np.lexsort((hjd, star))
+        hjd, star = hjd[order], star[order]
+        same_star = star[1:] == star[:-1]
+    duplicate = same_star & (hjd[1:] == hjd[:-1])
+    return np.bincount(star[1:][duplicate], minlength=n_stars) > 0
+
+
+def validate_stars(lc, min_observations=MIN_OBSERVATIONS, min_baseline=MIN_BASELINE):
+    """
+    Checks the light curves of a StarIndex before extracting their features,
+    with whole-tile array operations instead of one star at a time. Returns a
+    dataframe with the id of every star and the first of the REASONS it fails,
+    or NaN if it can be extracted.
+    """
+    hjd = np.asarray(lc.columns["hjd"], dtype=np.float64)
+    mag = np.asarray(lc.columns["mag"], dtype=np.float64)
+    err = np.asarray(lc.columns["err"], dtype=np.float64)
+    offsets = np.asarray(lc.offsets)
+    counts = np.diff(offsets)
+    n_stars = len(counts)
+    star = np.repeat(np.arange(n_stars), counts)
+
+    finite = np.isfinite(hjd) & np.isfinite(mag) & np.isfinite(err)
+    baseline = _star_reduce(np.maximum, hjd, offsets, counts) - _star_reduce(
+        np.minimum, hjd, offsets, counts
+    )
+    mag_range = _star_reduce(np.maximum, mag, offsets, counts) - _star_reduce(
+        np.minimum, mag, offsets, counts
+    )
+    failed = {
+        "non_finite": np.bincount(star[~finite], minlength=n_stars) > 0,
+        "too_few_points": counts < min_observations,
+        "non_positive_error": np.bincount(star[err <= 0], minlength=n_stars) > 0,
+        "duplicate_times": _duplicate_times(hjd, star, n_stars),
+        "zero_variance": ~(mag_range > 0),
+        "short_baseline": ~(baseline >= min_baseline),
+    }
+
+    reason = np.full(n_stars, None, dtype=object)
+    for name in reversed(REASONS):
+        reason[failed[name]] = name
+    return pd.DataFrame({"id": lc.ids, "reason": reason})
+
+
+def reason_counts(validation):
+    """Returns the number of stars rejected for each reason of validate_stars."""
+    return validation["reason"].value_counts().reindex(REASONS, fill_value=0)
@@ -1,9 +1,30 @@
-from pandas import read_csv
+from catalog.sky_index import SkyIndex
+from catalog.star_index import StarIndex
+from catalog.tile_cache import cached
+from catalog.tile_store import (
+    DEFAULT_BATCH_ROWS,
+    check_backend,
+    compact_dtype,
+    compact_table,
+    iter_csv_table,
+    iter_parquet_table,
+    iter_star_batches,
+    memory_saved,
+    prefetch_tiles,
+    read_csv_table,
+    read_parquet_table,
+    write_parquet_table,
+)
 
 
 class CatalogLoader:
-    def __init__(self, path):
+    def __init__(self, path, backend="csv", compact=False, cache=None):
         self.path = path
+        self.backend = check_backend(backend)
+        self.compact = compact
+        self.cache = cache
+        self._sky_index = None
+        self.memory_report = {}
         self._features_dtype = {
             "id": "int64",
             "cnt": "int64",
@@ -87,6 +108,12 @@ class CatalogLoader:
             "pwp_stack_src_mag3": "float64",
             "pwp_stack_src_mag_err3": "float64",
         }
+        self._lc_rename = {
+            "bm_src_id": "id",
+            "pwp_stack_src_hjd": "hjd",
+            "pwp_stack_src_mag3": "mag",
+            "pwp_stack_src_mag_err3": "err",
+        }
         self._tiles = [
             "b206",
             "b214",
@@ -107,21 +134,159 @@ class CatalogLoader:
             "b396",
         ]
 
-    def get_features(self, tile):
-        return read_csv(
-            f"{self.path}/{tile}_features.csv", dtype=self._features_dtype
-        ).iloc[:, 1:]
-
-    def get_lc(self, tile):
-        df = read_csv(f"{self.path}/{tile}_lc.csv", dtype=self._lc_dtype).iloc[:, 1:]
-        return df.rename(
-            columns={
-                "bm_src_id": "id",
-                "pwp_stack_src_hjd": "hjd",
-                "pwp_stack_src_mag3": "mag",
-                "pwp_stack_src_mag_err3": "err",
-            }
+    def get_features(self, tile, columns=None, filters=None):
+        """
+        Returns the features of a tile. columns selects a subset of columns and
+        filters is a list of (column, op, value) tuples, e.g.
+        [("vs_type", "in", rr_lyrae)].
+        """
+        filename = f"{self.path}/{tile}_features.{self.backend}"
+        return cached(
+            self.cache,
+            filename,
+            ("features", self.compact, columns, filters),
+            lambda: self._read_features(filename, tile, columns, filters),
+        )
+
+    def _read_features(self, filename, tile, columns, filters):
+        if self.backend == "parquet":
+            df = read_parquet_table(filename, columns, filters)
+        else:
+            df = read_csv_table(
+                filename,
+                dtype=self._get_features_dtype(),
+                columns=columns,
+                filters=filters,
+                drop_first=True,
+            )
+        return self._compact_features(df, f"{tile}_features")
+
+    def _get_features_dtype(self):
+        if self.compact:
+            return compact_dtype(self._features_dtype)
+        return self._features_dtype
+
+    def _compact_features(self, df, name):
+        """
+        In compact mode, narrows the dtypes of a features table and records the
+        memory saved in memory_report.
+        """
+        if not self.compact:
+            return df
+        df = compact_table(df, self._features_dtype)
+        self.memory_report[name] = memory_saved(df, self._features_dtype)
+        return df
+
+    def get_lc(self, tile, columns=None, filters=None):
+        """
+        Returns the observations of a tile with the columns renamed to
+        id, hjd, mag and err. columns and filters work as in get_features.
+        """
+        filename = f"{self.path}/{tile}_lc.{self.backend}"
+        return cached(
+            self.cache,
+            filename,
+            ("lc", columns, filters),
+            lambda: self._read_lc(filename, columns, filters),
         )
 
+    def _read_lc(self, filename, columns, filters):
+        if self.backend == "parquet":
+            return read_parquet_table(filename, columns, filters)
+        return read_csv_table(
+            filename,
+            dtype=self._lc_dtype,
+            columns=columns,
+            filters=filters,
+            rename=self._lc_rename,
+            drop_first=True,
+        )
+
+    def iter_lc(
+        self,
+        tile,
+        batch_stars=None,
+        batch_rows=DEFAULT_BATCH_ROWS,
+        columns=None,
+        filters=None,
+    ):
+        """
+        Yields the observations of a tile in batches of complete stars, with at
+        most batch_stars stars per batch. The file is read batch_rows rows at a
+        time, so the whole tile is never in memory. The observations of each
+        star must be contiguous in the file.
+        """
+        if columns is not None and "id" not in columns:
+            columns = ["id"] + list(columns)
+        if self.backend == "parquet":
+            chunks = iter_parquet_table(
+                f"{self.path}/{tile}_lc.parquet", batch_rows, columns, filters
+            )
+        else:
+            chunks = iter_csv_table(
+                f"{self.path}/{tile}_lc.csv",
+                dtype=self._lc_dtype,
+                batch_rows=batch_rows,
+                columns=columns,
+                filters=filters,
+                rename=self._lc_rename,
+                drop_first=True,
+            )
+        return iter_star_batches(chunks, batch_stars)
+
+    def get_star_index(self, tile, filters=None):
+        """Returns the observations of a tile as a StarIndex."""
+        lc = self.get_lc(tile, columns=["id", "hjd", "mag", "err"], filters=filters)
+        return StarIndex.from_dataframe(lc)
+
+    def convert_tile(self, tile):
+        """Converts the csv files of a tile to parquet files in the same path."""
+        features = read_csv_table(
+            f"{self.path}/{tile}_features.csv",
+            dtype=self._features_dtype,
+            drop_first=True,
+        )
+        write_parquet_table(features, f"{self.path}/{tile}_features.parquet")
+        del features
+
+        lc = read_csv_table(
+            f"{self.path}/{tile}_lc.csv",
+            dtype=self._lc_dtype,
+            rename=self._lc_rename,
+            drop_first=True,
+        )
+        write_parquet_table(lc, f"{self.path}/{tile}_lc.parquet", sort_by="id")
+
+    def iter_tiles(self, method, tiles=None, max_in_flight=2, **kwargs):
+        """
+        Yields (tile, result) calling the given loader method (e.g. "get_features")
+        on every tile, loading the next ones in the background. See prefetch_tiles.
+        """
+        return prefetch_tiles(
+            getattr(self, method), tiles or self._tiles, max_in_flight, **kwargs
+        )
+
+    def build_sky_index(self, tiles=None):
+        """Builds the spatial index of ra_k/dec_k in {path}/sky_index."""
+        self._sky_index = SkyIndex.build(self, f"{self.path}/sky_index", tiles)
+        return self._sky_index
+
+    def get_sky_index(self):
+        if self._sky_index is None:
+            self._sky_index = SkyIndex(f"{self.path}/sky_index")
+        return self._sky_index
+
+    def cone_search(self, ra, dec, radius):
+        """Returns the stars of every tile within radius degrees of (ra, dec)."""
+        return self.get_sky_index().cone(ra, dec, radius)
+
+    def box_search(self, ra_min, ra_max, dec_min, dec_max):
+        """Returns the stars of every tile inside the box, see SkyIndex.box."""
+        return self.get_sky_index().box(ra_min, ra_max, dec_min, dec_max)
+
+    def nearest_stars(self, ra, dec, k=1):
+        """Returns the k stars closest to (ra, dec) among all tiles."""
+        return self.get_sky_index().nearest(ra, dec, k)
+
     def list_tiles(self):
         return self._tiles
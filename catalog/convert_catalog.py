@@ -0,0 +1,12 @@
+import sys
+
+from catalog.catalog_loader import CatalogLoader
+
+# Converts the csv catalogs of every tile (or the tiles given as arguments)
+# to parquet, so they can be read with CatalogLoader(path, backend="parquet").
+loader = CatalogLoader("../catalog")
+tile_list = sys.argv[1:] or loader.list_tiles()
+
+for tile in tile_list:
+    loader.convert_tile(tile)
+    print(f"{tile} END")
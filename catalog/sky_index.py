@@ -0,0 +1,197 @@
+import numpy as np
+import os
+import pandas as pd
+import pickle
+
+from scipy.spatial import cKDTree
+
+# =============================================================================
+# FUNCTIONS
+# =============================================================================
+
+
+def radec_to_xyz(ra, dec):
+    """Converts ra and dec in degrees to unit vectors."""
+    ra, dec = np.radians(ra), np.radians(dec)
+    return np.column_stack(
+        [np.cos(dec) * np.cos(ra), np.cos(dec) * np.sin(ra), np.sin(dec)]
+    )
+
+
+def chord_to_angle(chord):
+    """Converts the distance between unit vectors to an angle in degrees."""
+    return np.degrees(2 * np.arcsin(np.clip(chord / 2, 0, 1)))
+
+
+def angle_to_chord(angle):
+    """Converts an angle in degrees to the distance between unit vectors."""
+    return 2 * np.sin(np.radians(np.minimum(angle, 180)) / 2)
+
+
+# =============================================================================
+# SKY INDEX CLASS
+# =============================================================================
+
+
+class SkyIndex:
+    """
+    A persisted spatial index on the ra_k/dec_k coordinates of the catalogs.
+    Every tile has a KD-tree of the stars as unit vectors, and a summary with
+    the bounds of each tile lets queries skip the tiles they cannot touch, so
+    only the trees of the relevant tiles are read from disk.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.summary = pd.read_csv(f"{path}/sky_index.csv")
+        self._trees = {}
+
+    @staticmethod
+    def build(loader, path, tiles=None):
+        """Builds the index of the given tiles (all by default) of a CatalogLoader."""
+        os.makedirs(path, exist_ok=True)
+        rows = []
+        for tile in tiles or loader.list_tiles():
+            features = loader.get_features(tile, columns=["id", "ra_k", "dec_k"])
+            features = features.dropna()
+            ra = features["ra_k"].to_numpy(dtype=np.float64)
+            dec = features["dec_k"].to_numpy(dtype=np.float64)
+            xyz = radec_to_xyz(ra, dec)
+
+            with open(f"{path}/{tile}_sky.pkl", "wb") as file:
+                pickle.dump(
+                    {
+                        "id": features["id"].to_numpy(),
+                        "ra": ra,
+                        "dec": dec,
+                        "tree": cKDTree(xyz),
+                    },
+                    file,
+                    protocol=pickle.HIGHEST_PROTOCOL,
+                )
+
+            # The tile is bounded by the smallest cap around its mean direction.
+            center = xyz.mean(axis=0)
+            center /= np.linalg.norm(center)
+            radius = chord_to_angle(np.linalg.norm(xyz - center, axis=1).max())
+            rows.append(
+                {
+                    "tile": tile,
+                    "n_stars": len(features),
+                    "x": center[0],
+                    "y": center[1],
+                    "z": center[2],
+                    "radius": radius,
+                    "ra_min": ra.min(),
+                    "ra_max": ra.max(),
+                    "dec_min": dec.min(),
+                    "dec_max": dec.max(),
+                }
+            )
+        pd.DataFrame(rows).to_csv(f"{path}/sky_index.csv", index=False)
+        return SkyIndex(path)
+
+    def _tile(self, tile):
+        if tile not in self._trees:
+            with open(f"{self.path}/{tile}_sky.pkl", "rb") as file:
+                self._trees[tile] = pickle.load(file)
+        return self._trees[tile]
+
+    def _tile_distances(self, ra, dec):
+        """Returns the angle from (ra, dec) to the center of every tile."""
+        center = self.summary[["x", "y", "z"]].to_numpy()
+        return chord_to_angle(np.linalg.norm(center - radec_to_xyz(ra, dec), axis=1))
+
+    def _result(self, tile, idx, distance=None):
+        data = self._tile(tile)
+        result = {
+            "tile": tile,
+            "id": data["id"][idx],
+            "ra_k": data["ra"][idx],
+            "dec_k": data["dec"][idx],
+        }
+        if distance is not None:
+            result["distance"] = distance
+        return pd.DataFrame(result)
+
+    def _concat(self, results, columns):
+        if not results:
+            return pd.DataFrame(columns=columns)
+        return pd.concat(results, ignore_index=True)
+
+    def cone(self, ra, dec, radius):
+        """Returns the stars within radius degrees of (ra, dec), with their distance."""
+        results = []
+        target = radec_to_xyz(ra, dec)[0]
+        tile_distances = self._tile_distances(ra, dec)
+        for tile, tile_distance, tile_radius in zip(
+            self.summary["tile"], tile_distances, self.summary["radius"]
+        ):
+            if tile_distance - tile_radius > radius:
+                continue
+            data = self._tile(tile)
+            idx = np.array(
+                data["tree"].query_ball_point(target, angle_to_chord(radius)),
+                dtype=np.int64,
+            )
+            distance = chord_to_angle(
+                np.linalg.norm(data["tree"].data[idx] - target, axis=1)
+            )
+            results.append(self._result(tile, idx, distance))
+
+        df = self._concat(results, ["tile", "id", "ra_k", "dec_k", "distance"])
+        return df.sort_values("distance", ignore_index=True)
+
+    def box(self, ra_min, ra_max, dec_min, dec_max):
+        """
+        Returns the stars with dec in [dec_min, dec_max] and ra in
+        [ra_min, ra_max]. If ra_min > ra_max the box wraps around ra = 0.
+        """
+        wraps = ra_min > ra_max
+        results = []
+        for _, bounds in self.summary.iterrows():
+            if bounds.dec_max < dec_min or bounds.dec_min > dec_max:
+                continue
+            if not wraps and (bounds.ra_max < ra_min or bounds.ra_min > ra_max):
+                continue
+            if wraps and bounds.ra_min > ra_max and bounds.ra_max < ra_min:
+                continue
+
+            data = self._tile(bounds.tile)
+            ra, dec = data["ra"], data["dec"]
+            if wraps:
+                in_ra = (ra >= ra_min) | (ra <= ra_max)
+            else:
+                in_ra = (ra >= ra_min) & (ra <= ra_max)
+            idx = np.flatnonzero(in_ra & (dec >= dec_min) & (dec <= dec_max))
+            results.append(self._result(bounds.tile, idx))
+
+        return self._concat(results, ["tile", "id", "ra_k", "dec_k"])
+
+    def nearest(self, ra, dec, k=1):
+        """Returns the k stars closest to (ra, dec), with their distance."""
+        target = radec_to_xyz(ra, dec)[0]
+        # The closest any star of a tile can be is its distance to the cap.
+        lower_bounds = np.maximum(
+            self._tile_distances(ra, dec) - self.summary["radius"].to_numpy(), 0
+        )
+        best = None
+        for order in np.argsort(lower_bounds):
+            if best is not None and len(best) == k:
+                if lower_bounds[order] > best["distance"].iloc[-1]:
+                    break
+
+            tile = self.summary["tile"].iloc[order]
+            data = self._tile(tile)
+            n = min(k, data["tree"].n)
+            if not n:
+                continue
+            chord, idx = data["tree"].query(target, k=n)
+            chord, idx = np.atleast_1d(chord), np.atleast_1d(idx)
+            candidates = self._result(tile, idx, chord_to_angle(chord))
+            best = candidates if best is None else pd.concat([best, candidates])
+            best = best.sort_values("distance", ignore_index=True).head(k)
+
+        if best is None:
+            return pd.DataFrame(columns=["tile", "id", "ra_k", "dec_k", "distance"])
+        return best
@@ -0,0 +1,179 @@
+import fcntl
+import json
+import numpy as np
+import os
+import shutil
+import tempfile
+
+from glob import glob
+
+
+def _source_stamp(source):
+    """The size and modification time of a file, to tell if it changed."""
+    stat = os.stat(source)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def _replace_dir(src, dst):
+    """
+    Points the symlink dst to the directory src and removes the directory it
+    pointed to. The symlink is swapped atomically, so readers resolving it get
+    either the old directory or the new one, and the lock keeps concurrent
+    writers from leaving directories behind.
+    """
+    with open(f"{dst}.lock", "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        old = os.path.realpath(dst) if os.path.islink(dst) else None
+        if os.path.isdir(dst) and not os.path.islink(dst):
+            # Written before the indexes were symlinks.
+            shutil.rmtree(dst)
+        link = f"{src}.link"
+        os.symlink(os.path.basename(src), link)
+        os.replace(link, dst)
+        if old is not None:
+            shutil.rmtree(old, ignore_errors=True)
+
+
+class StarIndex:
+    """
+    The observations of a tile grouped by star id. Every column is a contiguous
+    array where the observations of the i-th star are in offsets[i]:offsets[i + 1],
+    so accessing a star returns views without scanning the tile.
+    """
+
+    def __init__(self, ids, offsets, columns):
+        self.ids = ids
+        self.offsets = offsets
+        self.columns = columns
+        self._position = {id: idx for idx, id in enumerate(self.ids.tolist())}
+
+    @classmethod
+    def from_dataframe(cls, lc, columns=("hjd", "mag", "err")):
+        """
+        Builds the index from a light curve dataframe with an id column. The
+        stars keep the order of their first observation, as lc["id"].unique(),
+        so slices of ids select the same stars as slices of the unique ids.
+        """
+        id_array = lc["id"].to_numpy()
+        ids, first, inverse = np.unique(
+            id_array, return_index=True, return_inverse=True
+        )
+        appearance = np.argsort(first)
+        rank = np.empty_like(appearance)
+        rank[appearance] = np.arange(len(appearance))
+        star = rank[inverse.ravel()]
+        # A stable sort keeps the observations of each star in their original order.
+        order = np.argsort(star, kind="stable")
+        counts = np.bincount(star, minlength=len(ids))
+        offsets = np.append(0, np.cumsum(counts)).astype(np.int64)
+        return cls(
+            ids[appearance],
+            offsets,
+            {
+                column: np.ascontiguousarray(lc[column].to_numpy()[order])
+                for column in columns
+            },
+        )
+
+    @classmethod
+    def load(cls, path, mmap_mode="r"):
+        """
+        Opens an index written by save. With mmap_mode="r" the columns are
+        memory-mapped, so processes opening the same index share its pages and
+        get_star returns slices of the files without copying them.
+        """
+        while True:
+            # Resolved once, so the index is not mixed with one saved meanwhile.
+            real_path = os.path.realpath(path)
+            try:
+                index = cls._load(real_path, mmap_mode)
+                # Its files were all opened before any save could remove it.
+                if os.path.isdir(real_path):
+                    return index
+            except FileNotFoundError:
+                if os.path.realpath(path) == real_path:
+                    raise
+            # Replaced by a save while loading, load the new one.
+
+    @classmethod
+    def _load(cls, path, mmap_mode):
+        ids = np.load(f"{path}/ids.npy")
+        offsets = np.load(f"{path}/offsets.npy")
+        columns = {}
+        for filename in sorted(glob(f"{path}/*.npy")):
+            column = os.path.splitext(os.path.basename(filename))[0]
+            if column not in ("ids", "offsets"):
+                columns[column] = np.load(filename, mmap_mode=mmap_mode)
+        return cls(ids, offsets, columns)
+
+    def save(self, path, source=None):
+        """
+        Writes the index as one .npy file per array to a new directory, and
+        points the symlink path to it once complete, so other processes never
+        open a partial index. With source, the size and modification time of
+        that file are stored for is_current.
+        """
+        path = os.path.abspath(path)
+        tmp = tempfile.mkdtemp(
+            dir=os.path.dirname(path), prefix=f".{os.path.basename(path)}."
+        )
+        try:
+            os.chmod(tmp, 0o755)
+            np.save(f"{tmp}/ids.npy", self.ids)
+            np.save(f"{tmp}/offsets.npy", self.offsets)
+            for column, values in self.columns.items():
+                np.save(f"{tmp}/{column}.npy", values)
+            if source is not None:
+                with open(f"{tmp}/source.json", "w") as file:
+                    json.dump(_source_stamp(source), file)
+            _replace_dir(tmp, path)
+        except BaseException:
+            shutil.rmtree(tmp, ignore_errors=True)
+            raise
+
+    @staticmethod
+    def is_current(path, source):
+        """Whether path holds an index saved from source as it is now."""
+        try:
+            with open(f"{path}/source.json") as file:
+                return json.load(file) == _source_stamp(source)
+        except FileNotFoundError:
+            return False
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, id):
+        return id in self._position
+
+    def __iter__(self):
+        return iter(self.ids)
+
+    def get_star(self, id):
+        """Returns a dict with a view of every column for the star with the given id."""
+        idx = self._position[id]
+        start, end = self.offsets[idx], self.offsets[idx + 1]
+        return {column: values[start:end] for column, values in self.columns.items()}
+
+    def iter_stars(self):
+        """Yields (id, star) for every star, with star as returned by get_star."""
+        for idx, id in enumerate(self.ids):
+            start, end = self.offsets[idx], self.offsets[idx + 1]
+            yield id, {
+                column: values[start:end] for column, values in self.columns.items()
+            }
+
+    def select(self, ids):
+        """Returns a new index with a copy of the observations of the given stars."""
+        positions = np.array([self._position[id] for id in ids], dtype=np.int64)
+        starts, ends = self.offsets[positions], self.offsets[positions + 1]
+        counts = ends - starts
+        rows = np.concatenate(
+            [np.arange(start, end) for start, end in zip(starts, ends)]
+            or [np.array([], dtype=np.int64)]
+        )
+        return StarIndex(
+            self.ids[positions],
+            np.append(0, np.cumsum(counts)).astype(np.int64),
+            {column: values[rows] for column, values in self.columns.items()},
+        )
@@ -0,0 +1,104 @@
+import hashlib
+import os
+import pickle
+import threading
+
+from collections import OrderedDict
+
+
+class TileCache:
+    """
+    A cache of parsed tile tables that can be shared between loaders. Tables are
+    kept in memory in least recently used order up to max_bytes, and if path is
+    given they are also pickled to disk so other processes and later runs skip
+    the parsing. Entries are keyed by the source file path, size and
+    modification time, so they are invalidated when the file changes.
+    """
+
+    def __init__(self, max_bytes=4_000_000_000, path=None):
+        self.max_bytes = max_bytes
+        self.path = path
+        self.n_bytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        if path is not None:
+            os.makedirs(path, exist_ok=True)
+
+    def _stamp(self, filename):
+        stat = os.stat(filename)
+        return stat.st_size, stat.st_mtime_ns
+
+    def _disk_filename(self, key):
+        return f"{self.path}/{hashlib.sha1(str(key).encode()).hexdigest()}.pkl"
+
+    def _read_disk(self, key, stamp):
+        filename = self._disk_filename(key)
+        if not os.path.exists(filename):
+            return None
+        with open(filename, "rb") as file:
+            disk_stamp, df = pickle.load(file)
+        if disk_stamp != stamp:
+            os.remove(filename)
+            return None
+        return df
+
+    def _write_disk(self, key, stamp, df):
+        filename = self._disk_filename(key)
+        # Write to a temporary file first so readers never see half a pickle.
+        tmp_filename = f"{filename}.{os.getpid()}.{threading.get_ident()}"
+        with open(tmp_filename, "wb") as file:
+            pickle.dump((stamp, df), file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_filename, filename)
+
+    def _add(self, key, stamp, df):
+        n_bytes = df.memory_usage(deep=True).sum()
+        if n_bytes > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self.n_bytes -= self._entries.pop(key)[2]
+            self._entries[key] = (stamp, df, n_bytes)
+            self.n_bytes += n_bytes
+            while self.n_bytes > self.max_bytes:
+                _, (_, _, evicted_bytes) = self._entries.popitem(last=False)
+                self.n_bytes -= evicted_bytes
+
+    def get(self, filename, key, load):
+        """
+        Returns the table parsed from filename with the given key (the loading
+        arguments), calling load() only when it is not cached. The returned
+        dataframe is a shallow copy of the cached one, so it must not be
+        modified in place.
+        """
+        stamp = self._stamp(filename)
+        # The arguments may hold lists, so they are keyed by their repr.
+        key = (os.path.abspath(filename), repr(key))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == stamp:
+                self._entries.move_to_end(key)
+                return entry[1].copy(deep=False)
+
+        df = None
+        if self.path is not None:
+            df = self._read_disk(key, stamp)
+        if df is None:
+            df = load()
+            if self.path is not None:
+                self._write_disk(key, stamp, df)
+
+        self._add(key, stamp, df)
+        return df.copy(deep=False)
+
+    def clear(self):
+        """Empties the in-memory cache, the on-disk one is kept."""
+        with self._lock:
+            self._entries.clear()
+            self.n_bytes = 0
+
+
+def cached(cache, filename, key, load):
+    """Calls load() through cache if there is one."""
+    if cache is None:
+        return load()
+    return cache.get(filename, key, load)
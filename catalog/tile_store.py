@@ -0,0 +1,322 @@
+import numpy as np
+import operator
+import sys
+
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pandas import concat, read_csv, read_parquet, to_numeric
+from pandas.api.types import union_categoricals
+
+# =============================================================================
+# CONSTANTS
+# =============================================================================
+
+BACKENDS = ("csv", "parquet")
+
+DEFAULT_BATCH_ROWS = 1_000_000
+
+_COMPACT_DTYPE = {"float64": "float32", "str": "category"}
+
+_OPERATORS = {
+    "==": operator.eq,
+    "=": operator.eq,
+    "!=": operator.ne,
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+}
+
+
+# =============================================================================
+# FUNCTIONS
+# =============================================================================
+
+
+def check_backend(backend):
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend '{backend}', expected one of {BACKENDS}.")
+    return backend
+
+
+def apply_filters(df, filters):
+    """
+    Keeps the rows of df that satisfy every (column, op, value) tuple in filters.
+    Uses the same syntax as the pyarrow filters of pandas.read_parquet.
+    """
+    if not filters:
+        return df
+
+    mask = None
+    for column, op, value in filters:
+        if op == "in":
+            cond = df[column].isin(value)
+        elif op == "not in":
+            cond = ~df[column].isin(value)
+        elif op in _OPERATORS:
+            cond = _OPERATORS[op](df[column], value)
+        else:
+            raise ValueError(f"Unknown filter operator '{op}'.")
+        mask = cond if mask is None else mask & cond
+
+    return df[mask].reset_index(drop=True)
+
+
+def _usecols(columns, filters, rename):
+    """Returns the csv columns needed to build the requested columns and filters."""
+    inverse = {new: old for old, new in rename.items()}
+    filter_columns = [column for column, _, _ in filters or []]
+    needed = list(dict.fromkeys(list(columns) + filter_columns))
+    return [inverse.get(column, column) for column in needed]
+
+
+def _clean_csv_table(df, columns, filters, rename, drop_first):
+    if columns is None and drop_first:
+        df = df.iloc[:, 1:]
+    df = apply_filters(df.rename(columns=rename), filters)
+    return df if columns is None else df[list(columns)]
+
+
+def read_csv_table(
+    filename, dtype, columns=None, filters=None, rename=None, drop_first=False
+):
+    """
+    Reads a tile table from a csv file. columns and filters use the final
+    (renamed) column names, filtering is done after parsing.
+    """
+    rename = rename or {}
+    if columns is None:
+        df = read_csv(filename, dtype=dtype)
+    else:
+        # Parse only the requested columns plus the ones needed for filtering.
+        df = read_csv(filename, dtype=dtype, usecols=_usecols(columns, filters, rename))
+    return _clean_csv_table(df, columns, filters, rename, drop_first)
+
+
+def iter_csv_table(
+    filename,
+    dtype,
+    batch_rows=DEFAULT_BATCH_ROWS,
+    columns=None,
+    filters=None,
+    rename=None,
+    drop_first=False,
+):
+    """Like read_csv_table, but yields the table in chunks of batch_rows rows."""
+    rename = rename or {}
+    usecols = None if columns is None else _usecols(columns, filters, rename)
+    for df in read_csv(filename, dtype=dtype, usecols=usecols, chunksize=batch_rows):
+        yield _clean_csv_table(df, columns, filters, rename, drop_first)
+
+
+def read_parquet_table(filename, columns=None, filters=None):
+    """
+    Reads a tile table from a parquet file, projecting columns and pushing the
+    filters down to the reader so only the matching row groups are decoded.
+    """
+    df = read_parquet(
+        filename,
+        columns=list(columns) if columns is not None else None,
+        filters=filters,
+    )
+    return df.reset_index(drop=True)
+
+
+def iter_parquet_table(
+    filename, batch_rows=DEFAULT_BATCH_ROWS, columns=None, filters=None
+):
+    """Like read_parquet_table, but yields the table in chunks of batch_rows rows."""
+    from pyarrow.parquet import ParquetFile
+
+    parquet_file = ParquetFile(filename)
+    columns = list(columns) if columns is not None else None
+    filter_columns = [column for column, _, _ in filters or []]
+    read_columns = (
+        None if columns is None else list(dict.fromkeys(columns + filter_columns))
+    )
+    for batch in parquet_file.iter_batches(batch_size=batch_rows, columns=read_columns):
+        df = apply_filters(batch.to_pandas(), filters)
+        yield df if columns is None else df[columns]
+
+
+def _star_starts(ids):
+    return np.flatnonzero(np.append(True, ids[1:] != ids[:-1]))
+
+
+def _split_stars(df, batch_stars):
+    """Splits a table of complete stars in batches of batch_stars stars."""
+    if batch_stars is None:
+        yield df.reset_index(drop=True)
+        return
+    cuts = list(_star_starts(df["id"].to_numpy())[::batch_stars]) + [len(df)]
+    for begin, end in zip(cuts[:-1], cuts[1:]):
+        yield df.iloc[begin:end].reset_index(drop=True)
+
+
+def _check_new_stars(ids, seen):
+    """Raises if a star of ids was already yielded, then adds them to seen."""
+    for id in ids.tolist():
+        if id in seen:
+            raise ValueError(f"The observations of star {id} are not contiguous.")
+        seen.add(id)
+
+
+def iter_star_batches(chunks, batch_stars=None):
+    """
+    Regroups chunks of a light curve table so that every batch has complete
+    stars, and exactly batch_stars of them (except the last one) if given.
+    The observations of each star must be contiguous, as in the files written
+    by the loaders, or a ValueError is raised when the star appears again.
+    """
+    seen = set()
+    # Rows not yielded yet, concatenated only once they are.
+    pending = []
+    # Stars started in pending, the last of which may continue.
+    n_pending = 0
+    last_id = None
+    for chunk in chunks:
+        if not len(chunk):
+            continue
+
+        ids = chunk["id"].to_numpy()
+        new_starts = _star_starts(ids)
+        if ids[0] == last_id:
+            new_starts = new_starts[1:]
+        last_id = ids[-1]
+
+        # The last star of the chunk may continue in the next one, and the
+        # stars that do not fill a whole batch wait for the next chunk.
+        n_complete = n_pending + len(new_starts) - 1
+        if batch_stars is not None:
+            n_complete -= n_complete % batch_stars
+        if n_complete <= 0:
+            pending.append(chunk)
+            n_pending += len(new_starts)
+            continue
+
+        cut = new_starts[n_complete - n_pending]
+        ready = concat(pending + [chunk.iloc[:cut]], ignore_index=True)
+        ready_ids = ready["id"].to_numpy()
+        _check_new_stars(ready_ids[_star_starts(ready_ids)], seen)
+        yield from _split_stars(ready, batch_stars)
+        pending = [chunk.iloc[cut:]]
+        n_pending += len(new_starts) - n_complete
+
+    if pending:
+        pending = concat(pending, ignore_index=True)
+        ids = pending["id"].to_numpy()
+        _check_new_stars(ids[_star_starts(ids)], seen)
+        yield from _split_stars(pending, batch_stars)
+
+
+def compact_dtype(dtype):
+    """Returns dtype with float64 columns as float32 and strings as categories."""
+    return {column: _COMPACT_DTYPE.get(kind, kind) for column, kind in dtype.items()}
+
+
+def compact_table(df, dtype):
+    """
+    Casts the columns of df to compact_dtype(dtype) and stores every integer
+    column with the narrowest integer type that holds its values.
+    """
+    compact = compact_dtype(dtype)
+    df = df.astype(
+        {column: compact[column] for column in df.columns if column in compact}
+    )
+    for column in df.select_dtypes("integer").columns:
+        df[column] = to_numeric(df[column], downcast="integer")
+    return df
+
+
+def concat_compact(frames):
+    """Concatenates compact tables, keeping the categorical columns categorical."""
+    frames = list(frames)
+    for column in frames[0].select_dtypes("category").columns:
+        categories = union_categoricals([df[column] for df in frames]).categories
+        frames = [
+            df.assign(**{column: df[column].cat.set_categories(categories)})
+            for df in frames
+        ]
+    return concat(frames, ignore_index=True)
+
+
+def memory_saved(df, dtype):
+    """
+    Returns an estimate of the bytes df would use if loaded with dtype, and the
+    bytes it actually uses.
+    """
+    original = df.index.memory_usage()
+    for column in df.columns:
+        kind = dtype.get(column)
+        values = df[column]
+        if kind == "str" and values.dtype == "category":
+            # Loaded with dtype="str" every row holds a python string. Missing
+            # values have code -1, which picks the size of nan.
+            sizes = np.append(
+                values.cat.categories.map(sys.getsizeof), sys.getsizeof(np.nan)
+            )
+            original += 8 * len(values) + sizes[values.cat.codes.to_numpy()].sum()
+        elif kind is not None and kind != "str":
+            original += np.dtype(kind).itemsize * len(values)
+        else:
+            original += values.memory_usage(index=False, deep=True)
+    return original, df.memory_usage(deep=True).sum()
+
+
+def format_memory_report(report):
+    """Formats a {name: (original bytes, compact bytes)} dict as a table in MB."""
+    lines = []
+    for name, (original, compact) in report.items():
+        lines.append(
+            f"{name}: {original / 1e6:.1f} MB -> {compact / 1e6:.1f} MB "
+            f"(saved {(original - compact) / 1e6:.1f} MB)"
+        )
+    original = sum(original for original, _ in report.values())
+    compact = sum(compact for _, compact in report.values())
+    lines.append(
+        f"total: {original / 1e6:.1f} MB -> {compact / 1e6:.1f} MB "
+        f"(saved {(original - compact) / 1e6:.1f} MB)"
+    )
+    return "\n".join(lines)
+
+
+def prefetch_tiles(load, tiles, max_in_flight=2, **kwargs):
+    """
+    Yields (tile, load(tile, **kwargs)) for every tile in order. Up to
+    max_in_flight tiles are loaded concurrently on a thread pool while the
+    caller works on the current one, so at most max_in_flight + 1 tiles are in
+    memory at the same time.
+    """
+    tiles = iter(tiles)
+    pending = deque()
+    with ThreadPoolExecutor(max_workers=max_in_flight) as executor:
+        try:
+            for tile in tiles:
+                pending.append((tile, executor.submit(load, tile, **kwargs)))
+                if len(pending) == max_in_flight:
+                    break
+
+            while pending:
+                tile, future = pending.popleft()
+                result = future.result()
+                next_tile = next(tiles, None)
+                if next_tile is not None:
+                    pending.append(
+                        (next_tile, executor.submit(load, next_tile, **kwargs))
+                    )
+                yield tile, result
+                del result
+        finally:
+            # Do not wait for tiles the caller will never see.
+            for _, future in pending:
+                future.cancel()
+
+
+def write_parquet_table(df, filename, sort_by=None):
+    """
+    Writes a tile table to a parquet file. Sorting by id keeps the
+    observations of a star in neighbouring row groups.
+    """
+    if sort_by is not None:
+        df = df.sort_values(sort_by, kind="stable")
+    df.to_parquet(filename, index=False)
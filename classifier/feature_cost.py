@@ -0,0 +1,107 @@
+import numpy as np
+import pandas as pd
+import time
+
+from sklearn.metrics import average_precision_score
+from sklearn.model_selection import StratifiedKFold
+
+from classifier.rf_wrapper import RFWrapper
+from light_curve.feets_patch import clear_periodogram_cache
+
+# =============================================================================
+# FUNCTIONS
+# =============================================================================
+
+
+def extractor_times(fs, light_curves):
+    """
+    Runs the extractors of fs (a FeatureSpace) in its execution plan over the
+    (hjd, mag, err) light curves and returns, for every extractor, the mean
+    wall time per star, the features of fs it computes, all the features it
+    provides and the features it depends on. The periodogram shared by the
+    feets_patch extractors is computed again for each of them, so each one is
+    charged with it.
+    """
+    plan = fs.excecution_plan_
+    seconds = np.zeros(len(plan))
+    for hjd, mag, err in light_curves:
+        data = {"time": hjd, "magnitude": mag, "error": err}
+        features = {}
+        for i, extractor in enumerate(plan):
+            clear_periodogram_cache()
+            start = time.perf_counter()
+            features.update(extractor.extract(features=features, **data))
+            seconds[i] += time.perf_counter() - start
+
+    return pd.DataFrame(
+        {
+            "seconds": seconds / max(len(light_curves), 1),
+            "features": [
+                sorted(extractor.get_features() & fs.features_) for extractor in plan
+            ],
+            "provides": [sorted(extractor.get_features()) for extractor in plan],
+            "dependencies": [
+                sorted(extractor.get_dependencies()) for extractor in plan
+            ],
+        },
+        index=pd.Index([extractor.name for extractor in plan], name="extractor"),
+    )
+
+
+def extractor_costs(times, feature_names, importances):
+    """
+    Adds to the extractor_times the summed importance of the features of every
+    extractor in a fitted forest, with the features it was trained on.
+    Features the forest does not use count as zero.
+    """
+    importance = dict(zip(feature_names, importances))
+    costs = times.copy()
+    costs["importance"] = [
+        sum(importance.get(name, 0.0) for name in features)
+        for features in costs["features"]
+    ]
+    costs["importance_per_second"] = costs["importance"] / costs["seconds"]
+    return costs.sort_values("importance_per_second")
+
+
+def prune_extractors(costs, max_importance_loss):
+    """
+    Greedily removes the extractors of the extractor_costs with the least
+    importance per second, as long as their summed importance stays below
+    max_importance_loss and no remaining extractor depends on their features.
+    Returns the names of the removed extractors.
+    """
+    # Features only used as dependencies are not in costs["features"].
+    provider = {
+        feature: extractor
+        for extractor, features in costs["provides"].items()
+        for feature in features
+    }
+    kept = set(costs.index)
+    removed = []
+    loss = 0.0
+    for extractor, cost in costs.iterrows():
+        if loss + cost.importance > max_importance_loss:
+            continue
+        needed = {
+            provider.get(feature)
+            for other in kept - {extractor}
+            for feature in costs.at[other, "dependencies"]
+        }
+        if extractor in needed:
+            continue
+        kept.remove(extractor)
+        removed.append(extractor)
+        loss += cost.importance
+    return removed
+
+
+def cv_pr_auc(X, y, n_splits=10, n_jobs=1, seed=999):
+    """Returns the area under the precision-recall curve of a k-fold RFWrapper."""
+    skf = StratifiedKFold(n_splits=n_splits, shuffle=True, random_state=seed)
+    probabilities = np.zeros(len(y))
+    for train, test in skf.split(X, y):
+        rf = RFWrapper(n_jobs=n_jobs, seed=seed)
+        rf.fit(X[train], y[train])
+        probabilities[test] = rf.predict_proba(X[test])[:, 1]
+    return average_precision_score(y, probabilities)
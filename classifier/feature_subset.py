@@ -0,0 +1,85 @@
+import feets
+import json
+import light_curve.feets_patch
+import numpy as np
+import sys
+
+from joblib import load
+
+from augmented.augmented_loader import AugmentedLoader
+from classifier.feature_cost import (
+    cv_pr_auc,
+    extractor_costs,
+    extractor_times,
+    prune_extractors,
+)
+from catalog.star_index import StarIndex
+
+# Parameters.
+gp_lib = "george"
+tile = "b278"
+snr = 20
+n_synth = sys.argv[1]
+n_jobs = 10
+n_splits = 10
+# Stars timed per extractor.
+n_stars = 200
+# Largest summed forest importance of the removed features.
+max_importance_loss = 0.05
+seed = 999
+
+loader = AugmentedLoader("../augmented", gp_lib, snr, n_synth)
+df = loader.get_features(tile)
+df = df[~df.isin([np.nan, np.inf, -np.inf]).any(axis=1)]
+columns = list(df.drop(["rrlyr", "id"], axis=1).columns)
+
+# Forest fitted by full_rf.py.
+rf = load(f"rf_full_{tile}_{gp_lib}_snr{snr}_synth{n_synth}")["rf"]
+
+# Time the extractors over a sample of the stars.
+fs = feets.FeatureSpace(only=columns)
+# The store is written again if the observations changed since it was.
+lc_index = StarIndex.load(loader.update_star_store(tile), mmap_mode="r")
+rng = np.random.default_rng(seed)
+sample = rng.choice(df["id"].to_numpy(), min(n_stars, len(df)), replace=False)
+light_curves = []
+for star_id in sample:
+    star_lc = lc_index.get_star(star_id)
+    light_curves.append((star_lc["hjd"], star_lc["mag"], star_lc["err"]))
+times = extractor_times(fs, light_curves)
+
+costs = extractor_costs(
+    times, rf.model.feature_names_in_, rf.model.feature_importances_
+)
+removed = prune_extractors(costs, max_importance_loss)
+removed_features = {
+    feature for extractor in removed for feature in costs.at[extractor, "features"]
+}
+kept = [feature for feature in columns if feature not in removed_features]
+
+# Expected loss of the pruned space.
+X = df[columns].to_numpy()
+y = df["rrlyr"].to_numpy()
+pr_auc = cv_pr_auc(X, y, n_splits, n_jobs, seed)
+pr_auc_pruned = cv_pr_auc(df[kept].to_numpy(), y, n_splits, n_jobs, seed)
+
+name = f"{tile}_{gp_lib}_snr{snr}_synth{n_synth}"
+costs.to_csv(f"feature_cost_{name}.csv")
+# The arguments of the pruned feets.FeatureSpace.
+spec = {
+    "only": kept,
+    "removed_extractors": removed,
+    "seconds": costs["seconds"].sum(),
+    "seconds_pruned": costs["seconds"].drop(removed).sum(),
+    "pr_auc": pr_auc,
+    "pr_auc_pruned": pr_auc_pruned,
+    "pr_auc_loss": pr_auc - pr_auc_pruned,
+}
+with open(f"feature_subset_{name}.json", "w") as file:
+    json.dump(spec, file, indent=4)
+
+print(
+    f"Removed {len(removed)} extractors ({', '.join(removed)}): "
+    f"{spec['seconds_pruned']:.3f} s instead of {spec['seconds']:.3f} s per star, "
+    f"PR-AUC {pr_auc_pruned:.4f} instead of {pr_auc:.4f}."
+)
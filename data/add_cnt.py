@@ -4,10 +4,9 @@ import pandas as pd
 from catalog.catalog_loader import CatalogLoader
 
 loader = CatalogLoader("../catalog")
-tile_list = loader.list_tiles()
 
-for tile in tile_list:
-    catalog = loader.get_features(tile)
+# Load the next tile while the current one is processed.
+for tile, catalog in loader.iter_tiles("get_features", columns=["id", "cnt"]):
     df = pd.read_csv(f"min_obs_{tile}_snr20.csv")
     if "cnt" not in df.columns:
         id_list = df.bm_src_id
@@ -5,10 +5,9 @@ from catalog.catalog_loader import CatalogLoader
 from light_curve.light_curve_sampler import LightCurveSampler
 
 loader = CatalogLoader("../catalog")
-tile_list = loader.list_tiles()
 
-for tile in tile_list:
-    lc = loader.get_lc(tile)
+# Load the next tile while the current one is processed.
+for tile, lc in loader.iter_tiles("get_lc"):
     df = pd.read_csv(f"min_obs_{tile}_snr20.csv")
     if "median_hjd" not in df.columns:
         median_list = np.zeros(len(df.index))
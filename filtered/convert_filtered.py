@@ -0,0 +1,14 @@
+import sys
+
+from filtered.filtered_loader import FilteredLoader
+
+# Converts the filtered csv files of every tile (or the tiles given as
+# arguments) to parquet, so they can be read with
+# FilteredLoader(path, backend="parquet").
+snr = 20
+loader = FilteredLoader("../filtered")
+tile_list = sys.argv[1:] or loader.list_tiles()
+
+for tile in tile_list:
+    loader.convert_tile(tile, snr)
+    print(f"{tile} END")
@@ -1,9 +1,28 @@
-from pandas import read_csv
+from catalog.star_index import StarIndex
+from catalog.tile_cache import cached
+from catalog.tile_store import (
+    DEFAULT_BATCH_ROWS,
+    check_backend,
+    compact_dtype,
+    compact_table,
+    iter_csv_table,
+    iter_parquet_table,
+    iter_star_batches,
+    memory_saved,
+    prefetch_tiles,
+    read_csv_table,
+    read_parquet_table,
+    write_parquet_table,
+)
 
 
 class FilteredLoader:
-    def __init__(self, path):
+    def __init__(self, path, backend="csv", compact=False, cache=None):
         self.path = path
+        self.backend = check_backend(backend)
+        self.compact = compact
+        self.cache = cache
+        self.memory_report = {}
         self._features_dtype = {
             "id": "int64",
             "cnt": "int64",
@@ -105,15 +124,145 @@ class FilteredLoader:
             "b396",
         ]
 
-    def get_features(self, tile, snr):
-        return read_csv(
-            f"{self.path}/filtered_{tile}_features_snr{snr}.csv",
-            dtype=self._features_dtype,
+    def get_features(self, tile, snr, columns=None, filters=None):
+        """
+        Returns the features of a tile. columns selects a subset of columns and
+        filters is a list of (column, op, value) tuples, e.g.
+        [("vs_type", "in", rr_lyrae)].
+        """
+        name = f"filtered_{tile}_features_snr{snr}"
+        filename = f"{self.path}/{name}.{self.backend}"
+        return cached(
+            self.cache,
+            filename,
+            ("features", self.compact, columns, filters),
+            lambda: self._read_features(filename, name, columns, filters),
         )
 
-    def get_lc(self, tile, snr):
-        return read_csv(
-            f"{self.path}/filtered_{tile}_lc_snr{snr}.csv", dtype=self._lc_dtype
+    def _read_features(self, filename, name, columns, filters):
+        if self.backend == "parquet":
+            df = read_parquet_table(filename, columns, filters)
+        else:
+            df = read_csv_table(
+                filename,
+                dtype=self._get_features_dtype(),
+                columns=columns,
+                filters=filters,
+            )
+        return self._compact_features(df, name)
+
+    def _get_features_dtype(self):
+        if self.compact:
+            return compact_dtype(self._features_dtype)
+        return self._features_dtype
+
+    def _compact_features(self, df, name):
+        """
+        In compact mode, narrows the dtypes of a features table and records the
+        memory saved in memory_report.
+        """
+        if not self.compact:
+            return df
+        df = compact_table(df, self._features_dtype)
+        self.memory_report[name] = memory_saved(df, self._features_dtype)
+        return df
+
+    def _lc_filename(self, tile, snr):
+        return f"{self.path}/filtered_{tile}_lc_snr{snr}.{self.backend}"
+
+    def get_lc(self, tile, snr, columns=None, filters=None):
+        """Returns the observations of a tile, see get_features for the arguments."""
+        filename = self._lc_filename(tile, snr)
+        return cached(
+            self.cache,
+            filename,
+            ("lc", columns, filters),
+            lambda: self._read_lc(filename, columns, filters),
+        )
+
+    def _read_lc(self, filename, columns, filters):
+        if self.backend == "parquet":
+            return read_parquet_table(filename, columns, filters)
+        return read_csv_table(
+            filename, dtype=self._lc_dtype, columns=columns, filters=filters
+        )
+
+    def iter_lc(
+        self,
+        tile,
+        snr,
+        batch_stars=None,
+        batch_rows=DEFAULT_BATCH_ROWS,
+        columns=None,
+        filters=None,
+    ):
+        """
+        Yields the observations of a tile in batches of complete stars, with at
+        most batch_stars stars per batch. The file is read batch_rows rows at a
+        time, so the whole tile is never in memory. The observations of each
+        star must be contiguous in the file.
+        """
+        if columns is not None and "id" not in columns:
+            columns = ["id"] + list(columns)
+        filename = f"{self.path}/filtered_{tile}_lc_snr{snr}"
+        if self.backend == "parquet":
+            chunks = iter_parquet_table(
+                f"{filename}.parquet", batch_rows, columns, filters
+            )
+        else:
+            chunks = iter_csv_table(
+                f"{filename}.csv",
+                dtype=self._lc_dtype,
+                batch_rows=batch_rows,
+                columns=columns,
+                filters=filters,
+            )
+        return iter_star_batches(chunks, batch_stars)
+
+    def get_star_index(self, tile, snr, filters=None):
+        """Returns the observations of a tile as a StarIndex."""
+        return StarIndex.from_dataframe(self.get_lc(tile, snr, filters=filters))
+
+    def star_store_path(self, tile, snr):
+        return f"{self.path}/filtered_{tile}_lc_snr{snr}_store"
+
+    def write_star_store(self, tile, snr):
+        """Writes the observations of a tile as a memory-mappable StarIndex."""
+        path = self.star_store_path(tile, snr)
+        self.get_star_index(tile, snr).save(path, source=self._lc_filename(tile, snr))
+        return path
+
+    def update_star_store(self, tile, snr):
+        """
+        Returns the path of the StarIndex store of a tile, writing it if it is
+        missing or older than the observations file.
+        """
+        path = self.star_store_path(tile, snr)
+        if not StarIndex.is_current(path, self._lc_filename(tile, snr)):
+            self.write_star_store(tile, snr)
+        return path
+
+    def open_star_store(self, tile, snr, mmap_mode="r"):
+        return StarIndex.load(self.star_store_path(tile, snr), mmap_mode=mmap_mode)
+
+    def convert_tile(self, tile, snr):
+        """Converts the csv files of a tile to parquet files in the same path."""
+        filename = f"{self.path}/filtered_{tile}_features_snr{snr}"
+        features = read_csv_table(f"{filename}.csv", dtype=self._features_dtype)
+        write_parquet_table(features, f"{filename}.parquet")
+        del features
+
+        filename = f"{self.path}/filtered_{tile}_lc_snr{snr}"
+        lc = read_csv_table(f"{filename}.csv", dtype=self._lc_dtype)
+        write_parquet_table(lc, f"{filename}.parquet", sort_by="id")
+
+    def iter_tiles(self, method, tiles=None, max_in_flight=2, **kwargs):
+        """
+        Yields (tile, result) calling the given loader method (e.g. "get_features")
+        on every tile, loading the next ones in the background. See prefetch_tiles.
+        """
+        return prefetch_tiles(
+            getattr(self, method), tiles or self._tiles, max_in_flight, **kwargs
         )
 
     def list_tiles(self):
@@ -1,7 +1,9 @@
 import feets
+import math
 
 import numpy as np
 
+from collections import deque
 from scipy.optimize import curve_fit
 
 from astropy.timeseries import LombScargle
@@ -17,23 +19,121 @@ from feets import Extractor
 
 EPS = np.finfo(float).eps
 
+# Last periodograms computed, shared by the extractors of a single extraction.
+PERIODOGRAM_CACHE_SIZE = 4
+_periodogram_cache = deque(maxlen=PERIODOGRAM_CACHE_SIZE)
+
 
 # =============================================================================
 # FUNCTIONS
 # =============================================================================
 
 
-def lscargle_error(time, magnitude, error, model_kwds=None, autopower_kwds=None):
+def _local_maxima(power, n_peaks):
+    """Returns the indices of the n_peaks highest local maxima of power."""
+    padded = np.concatenate([[-np.inf], power, [-np.inf]])
+    peaks = np.flatnonzero((padded[1:-1] >= padded[:-2]) & (padded[1:-1] > padded[2:]))
+    return peaks[np.argsort(power[peaks])[::-1][:n_peaks]]
+
+
+def adaptive_autopower(
+    model,
+    n_peaks=5,
+    coarsening=5,
+    samples_per_peak=5,
+    nyquist_factor=5,
+    minimum_frequency=None,
+    maximum_frequency=None,
+    normalization="standard",
+    **power_kwds
+):
+    """
+    Coarse-to-fine version of model.autopower. The power is computed on every
+    coarsening-th frequency of the autopower grid, and the frequencies around
+    the n_peaks highest peaks are evaluated again with the exact method.
+    Returns the full autopower grid, where the frequencies that were skipped
+    have power 0, so the argmax indexes the same grid as autopower.
+    """
+    frequency = model.autofrequency(
+        samples_per_peak=samples_per_peak,
+        nyquist_factor=nyquist_factor,
+        minimum_frequency=minimum_frequency,
+        maximum_frequency=maximum_frequency,
+    )
+    power = np.zeros(len(frequency))
+    coarse = np.arange(0, len(frequency), coarsening)
+    power[coarse] = model.power(
+        frequency[coarse],
+        normalization=normalization,
+        assume_regular_frequency=True,
+        **power_kwds
+    )
+
+    # Evaluate every frequency between each peak and its coarse neighbours.
+    peaks = coarse[_local_maxima(power[coarse], n_peaks)]
+    fine = np.unique(
+        (peaks[:, np.newaxis] + np.arange(-coarsening + 1, coarsening)).ravel()
+    )
+    fine = fine[(fine >= 0) & (fine < len(frequency))]
+    power[fine] = model.power(
+        frequency[fine], normalization=normalization, method="cython"
+    )
+    return frequency, power
+
+
+def lscargle_error(
+    time, magnitude, error, model_kwds=None, autopower_kwds=None, search_kwds=None
+):
+    """
+    Computes the periodogram with autopower, or with adaptive_autopower if
+    search_kwds is given (an empty dict uses its defaults) to trade a little
+    accuracy for speed.
+    """
     model_kwds = model_kwds or {}
     autopower_kwds = autopower_kwds or {}
     model = LombScargle(time, magnitude, error, **model_kwds)
-    frequency, power = model.autopower(**autopower_kwds)
+    if search_kwds is None:
+        frequency, power = model.autopower(**autopower_kwds)
+    else:
+        frequency, power = adaptive_autopower(model, **search_kwds, **autopower_kwds)
 
     fmax = np.argmax(power)
 
     return frequency, power, fmax
 
 
+def cached_lscargle_error(
+    time, magnitude, error, model_kwds=None, autopower_kwds=None, search_kwds=None
+):
+    """
+    Same as lscargle_error, but reuses the result of a recent call with equal
+    arguments. LombScargleWithError and FourierComponentsWithError both compute
+    the periodogram of the same light curve, so this computes it once.
+    """
+    kwds = repr((model_kwds, autopower_kwds, search_kwds))
+    for c_time, c_magnitude, c_error, c_kwds, result in _periodogram_cache:
+        if (
+            c_kwds == kwds
+            and np.array_equal(c_time, time)
+            and np.array_equal(c_magnitude, magnitude)
+            and np.array_equal(c_error, error)
+        ):
+            return result
+
+    result = lscargle_error(
+        time, magnitude, error, model_kwds, autopower_kwds, search_kwds
+    )
+    _periodogram_cache.append(
+        (np.copy(time), np.copy(magnitude), np.copy(error), kwds, result)
+    )
+    return result
+
+
+def clear_periodogram_cache():
+    """Forgets the periodograms kept by cached_lscargle_error."""
+    _periodogram_cache.clear()
+
+
 def fap_error(
     max_power, fmax, time, magnitude, error, method, normalization, method_kwds=None
 ):
@@ -51,6 +151,38 @@ def fap_error(
     )
 
 
+def estimate_period(
+    time, magnitude, error, with_fap=False, lscargle_kwds=None, fap_kwds=None
+):
+    """
+    Returns the PeriodLS of LombScargleWithError without going through a
+    FeatureSpace. The false alarm probability (Period_fit) is only computed
+    with with_fap, and then (PeriodLS, Period_fit) is returned. The arguments
+    default to the parameters of LombScargleWithError.
+    """
+    time, magnitude, error = (
+        np.ravel(np.asarray(values, dtype=float)) for values in (time, magnitude, error)
+    )
+    params = LombScargleWithError.get_default_params()
+    lscargle_kwds = params["lscargle_kwds"] if lscargle_kwds is None else lscargle_kwds
+    frequency, power, fmax = cached_lscargle_error(
+        time=time, magnitude=magnitude, error=error, **lscargle_kwds
+    )
+    period = 1 / frequency[fmax]
+    if not with_fap:
+        return period
+
+    fap = fap_error(
+        max_power=np.max(power),
+        fmax=fmax,
+        time=time,
+        magnitude=magnitude,
+        error=error,
+        **(params["fap_kwds"] if fap_kwds is None else fap_kwds)
+    )
+    return period, fap
+
+
 # =============================================================================
 # EXTRACTOR CLASS
 # =============================================================================
@@ -66,13 +198,16 @@ class LombScargleWithError(Extractor):
                 "normalization": "standard",
                 "maximum_frequency": 10.0,
                 "minimum_frequency": 1.0 / 200,
-            }
+            },
+            # With "search_kwds": {} the periodogram is computed with
+            # adaptive_autopower. Give FourierComponentsWithError the same
+            # lscargle_kwds to keep sharing the periodogram.
         },
         "fap_kwds": {"normalization": "standard", "method": "simple"},
     }
 
     def _compute_ls(self, magnitude, time, error, lscargle_kwds):
-        frequency, power, fmax = lscargle_error(
+        frequency, power, fmax = cached_lscargle_error(
             time=time, magnitude=magnitude, error=error, **lscargle_kwds
         )
         best_period = 1 / frequency[fmax]
@@ -179,7 +314,11 @@ class FourierComponentsWithError(Extractor):
                 "maximum_frequency": 10.0,
                 "minimum_frequency": 1.0 / 200,
             }
-        }
+        },
+        # The model is linear in a, b and c, so linear_fit solves it directly
+        # instead of using curve_fit. weighted uses the errors as sigma.
+        "linear_fit": False,
+        "weighted": False,
     }
 
     def _model(self, x, a, b, c, Freq):
@@ -193,12 +332,29 @@ class FourierComponentsWithError(Extractor):
 
         return func
 
-    def _components(self, magnitude, time, error, lscargle_kwds):
+    def _linear_fit(self, x, y, weights, Freq):
+        """Least squares solution of _model for a, b and c."""
+        design = np.column_stack(
+            [
+                np.sin(2 * np.pi * Freq * x),
+                np.cos(2 * np.pi * Freq * x),
+                np.ones_like(x),
+            ]
+        )
+        if weights is not None:
+            design, y = design * weights[:, np.newaxis], y * weights
+        return np.linalg.lstsq(design, y, rcond=None)[0]
+
+    def _components(self, magnitude, time, error, lscargle_kwds, linear_fit, weighted):
+        # The periodogram does not depend on the time origin, so it is computed
+        # with the original times to share it with LombScargleWithError.
+        original_time = time
         time = time - np.min(time)
+        sigma = error if weighted else None
         A, PH = [], []
         for i in range(3):
-            frequency, power, fmax = lscargle_error(
-                time=time, magnitude=magnitude, error=error, **lscargle_kwds
+            frequency, power, fmax = cached_lscargle_error(
+                time=original_time, magnitude=magnitude, error=error, **lscargle_kwds
             )
 
             fundamental_Freq = frequency[fmax]
@@ -206,10 +362,18 @@ class FourierComponentsWithError(Extractor):
             omagnitude = magnitude
 
             for j in range(4):
-                function_to_fit = self._yfunc_maker((j + 1) * fundamental_Freq)
-                popt0, popt1, popt2 = curve_fit(function_to_fit, time, omagnitude)[0][
-                    :3
-                ]
+                if linear_fit:
+                    popt0, popt1, popt2 = self._linear_fit(
+                        time,
+                        omagnitude,
+                        None if sigma is None else 1.0 / sigma,
+                        (j + 1) * fundamental_Freq,
+                    )
+                else:
+                    function_to_fit = self._yfunc_maker((j + 1) * fundamental_Freq)
+                    popt0, popt1, popt2 = curve_fit(
+                        function_to_fit, time, omagnitude, sigma=sigma
+                    )[0][:3]
 
                 Atemp.append(np.sqrt(popt0**2 + popt1**2))
                 PHtemp.append(np.arctan(popt1 / popt0))
@@ -227,11 +391,16 @@ class FourierComponentsWithError(Extractor):
 
         return A, scaledPH
 
-    def fit(self, magnitude, time, error, lscargle_kwds):
+    def fit(self, magnitude, time, error, lscargle_kwds, linear_fit, weighted):
         lscargle_kwds = lscargle_kwds or {}
 
         A, sPH = self._components(
-            magnitude=magnitude, time=time, error=error, lscargle_kwds=lscargle_kwds
+            magnitude=magnitude,
+            time=time,
+            error=error,
+            lscargle_kwds=lscargle_kwds,
+            linear_fit=linear_fit,
+            weighted=weighted,
         )
         result = {
             "Freq1_harmonics_amplitude_0": A[0][0],
@@ -267,9 +436,21 @@ class FourierComponentsWithError(Extractor):
 # =============================================================================
 
 
+def _sorted_median(sorted_data):
+    """np.median of an already sorted array."""
+    mid = len(sorted_data) // 2
+    if len(sorted_data) % 2:
+        return sorted_data[mid]
+    return (sorted_data[mid - 1] + sorted_data[mid]) / 2
+
+
 @feets.register_extractor
-class GskewNearest(Extractor):
-    """Median-of-magnitudes based measure of the skew.
+class OrderStatistics(Extractor):
+    """
+    The features of feets based on the order of the magnitudes, computed from
+    a single sort of the light curve instead of one per extractor. The values
+    are the same as the ones of the feets extractors, except for Gskew, whose
+    percentiles use the given interpolation ("nearest" by default).
 
     .. math::
 
@@ -286,22 +467,84 @@ class GskewNearest(Extractor):
     """
 
     data = ["magnitude"]
-    features = ["Gskew"]
+    features = [
+        "Amplitude",
+        "FluxPercentileRatioMid20",
+        "FluxPercentileRatioMid35",
+        "FluxPercentileRatioMid50",
+        "FluxPercentileRatioMid65",
+        "FluxPercentileRatioMid80",
+        "Gskew",
+        "MedianAbsDev",
+        "MedianBRP",
+        "PercentAmplitude",
+        "PercentDifferenceFluxPercentile",
+        "Q31",
+    ]
     params = {"interpolation": "nearest"}
 
-    def calculate_gskew(self, magnitude, interpolation):
-        median_mag = np.median(magnitude)
-        F_3_value = np.percentile(magnitude, 3, interpolation=interpolation)
-        F_97_value = np.percentile(magnitude, 97, interpolation=interpolation)
+    def _flux_percentile(self, sorted_data, fraction):
+        return sorted_data[int(math.ceil(fraction * len(sorted_data)))]
 
-        skew = (
-            np.median(magnitude[magnitude <= F_3_value])
-            + np.median(magnitude[magnitude >= F_97_value])
-            - 2 * median_mag
-        )
+    def _flux_percentile_ratio(self, sorted_data, low, high, F_5_95):
+        return (
+            self._flux_percentile(sorted_data, high)
+            - self._flux_percentile(sorted_data, low)
+        ) / F_5_95
 
-        return skew
+    def _gskew(self, sorted_data, median, interpolation):
+        F_3_value, F_97_value = np.percentile(
+            sorted_data, [3, 97], interpolation=interpolation
+        )
+        # The magnitudes <= F_3_value and >= F_97_value are the ends of the array.
+        low = sorted_data[: np.searchsorted(sorted_data, F_3_value, side="right")]
+        high = sorted_data[np.searchsorted(sorted_data, F_97_value, side="left") :]
+        return _sorted_median(low) + _sorted_median(high) - 2 * median
 
     def fit(self, magnitude, interpolation):
-        skew = self.calculate_gskew(magnitude, interpolation=interpolation)
-        return {"Gskew": skew}
+        sorted_data = np.sort(magnitude)
+        N = len(sorted_data)
+        median = _sorted_median(sorted_data)
+
+        # Amplitude and PercentAmplitude.
+        n_edge = int(math.ceil(0.05 * N))
+        amplitude = (
+            _sorted_median(sorted_data[-n_edge:]) - _sorted_median(sorted_data[:n_edge])
+        ) / 2.0
+        max_distance = max(sorted_data[-1] - median, median - sorted_data[0])
+
+        # The magnitudes within a tenth of the range around the median.
+        brp_amplitude = (sorted_data[-1] - sorted_data[0]) / 10
+        brp_count = np.searchsorted(
+            sorted_data, median + brp_amplitude, side="left"
+        ) - np.searchsorted(sorted_data, median - brp_amplitude, side="right")
+
+        q25, q75 = np.percentile(sorted_data, [25, 75])
+        F_5_95 = self._flux_percentile(sorted_data, 0.95) - self._flux_percentile(
+            sorted_data, 0.05
+        )
+
+        return {
+            "Amplitude": amplitude,
+            "FluxPercentileRatioMid20": self._flux_percentile_ratio(
+                sorted_data, 0.40, 0.60, F_5_95
+            ),
+            "FluxPercentileRatioMid35": self._flux_percentile_ratio(
+                sorted_data, 0.325, 0.675, F_5_95
+            ),
+            "FluxPercentileRatioMid50": self._flux_percentile_ratio(
+                sorted_data, 0.25, 0.75, F_5_95
+            ),
+            "FluxPercentileRatioMid65": self._flux_percentile_ratio(
+                sorted_data, 0.175, 0.825, F_5_95
+            ),
+            "FluxPercentileRatioMid80": self._flux_percentile_ratio(
+                sorted_data, 0.10, 0.90, F_5_95
+            ),
+            "Gskew": self._gskew(sorted_data, median, interpolation),
+            "MedianAbsDev": np.median(np.abs(sorted_data - median)),
+            "MedianBRP": float(max(brp_count, 0)) / N,
+            "PercentAmplitude": max_distance / median,
+            "PercentDifferenceFluxPercentile": F_5_95 / median,
+            "Q31": q75 - q25,
+        }
@@ -2,6 +2,7 @@ import george
 import jax
 import jax.numpy as jnp
 import numpy as np
+import os
 import tinygp
 
 from abc import ABC, abstractmethod
@@ -11,12 +12,121 @@ from sklearn.gaussian_process import GaussianProcessRegressor
 from sklearn.gaussian_process.kernels import ExpSineSquared
 from sklearn.utils.validation import check_X_y, check_array, check_is_fitted
 from scipy.optimize import minimize
+from tinygp.kernels import quasisep
 
 jax.config.update("jax_enable_x64", True)
 
+# Default directory of enable_compilation_cache.
+COMPILATION_CACHE_DIR = os.environ.get(
+    "JAX_COMPILATION_CACHE_DIR", os.path.expanduser("~/.cache/jax_compilation")
+)
+
+# Light curves are padded to the smallest of these lengths that fits them, so
+# the jitted functions only compile once per bucket.
+LENGTH_BUCKETS = (64, 96, 128, 192, 256, 384, 512, 768, 1024, 1536, 2048)
+# Noise variance of the padding points, large enough for them to not change
+# the fit of the real ones.
+PADDING_VARIANCE = 1e12
+
+
+def enable_compilation_cache(path=COMPILATION_CACHE_DIR):
+    """
+    Keeps the compilations of the jitted functions in path, so every worker and
+    later run reuses them. Call it before the first computation.
+    """
+    try:
+        jax.config.update("jax_compilation_cache_dir", path)
+    except AttributeError:
+        # Older jax versions only have initialize_cache.
+        from jax.experimental.compilation_cache import compilation_cache
+
+        if not compilation_cache.is_initialized():
+            compilation_cache.initialize_cache(path)
+    # Each bucket compiles in under a second, which is still worth keeping.
+    jax.config.update("jax_persistent_cache_min_compile_time_secs", 0)
+
+
+def _bucket(n, buckets=LENGTH_BUCKETS):
+    """Returns the padded length of n points."""
+    for length in buckets:
+        if n <= length:
+            return length
+    return buckets[-1] * int(np.ceil(n / buckets[-1]))
+
+
+def _pad(values, length, fill):
+    return np.append(values, np.full(length - len(values), fill))
+
+
+def _pad_light_curve(X, y, y_err, length, X_fill=0.0):
+    """Returns X, y, the noise variance and the mask of the real points of length."""
+    return (
+        _pad(X, length, X_fill),
+        _pad(y, length, 0.0),
+        _pad(y_err**2, length, PADDING_VARIANCE),
+        np.arange(length) < len(X),
+    )
+
+
+def _tiny_gp(params, X, diag, period):
+    # The amplitude of the kernel is fixed to 1, as in TinyGPWrapper.fit.
+    length_scale = jnp.exp(params["log_length_scale"])
+    kernel = tinygp.kernels.ExpSineSquared(gamma=length_scale, scale=period)
+    return tinygp.GaussianProcess(kernel, X, diag=diag)
+
+
+def _padding_log_likelihood(mask):
+    """
+    Log likelihood of the padding points of a light curve padded with
+    _pad_light_curve. They are independent of the rest, so it is a constant
+    removed to get the likelihood of the real points only.
+    """
+    return -0.5 * jnp.sum(~mask) * jnp.log(2 * jnp.pi * PADDING_VARIANCE)
+
+
+def _tiny_neg_log_likelihood(params, X, y, diag, mask, period):
+    gp = _tiny_gp(params, X, diag, period)
+    return _padding_log_likelihood(mask) - gp.log_probability(y)
+
+
+@jax.jit
+def _tiny_predict(params, X, y, diag, period, X_pred):
+    return _tiny_gp(params, X, diag, period).predict(y, X_pred, return_var=True)
+
+
+# A single solver, so the jitted likelihood is shared by every TinyGPWrapper.fit.
+_tiny_solver = ScipyMinimize(fun=_tiny_neg_log_likelihood)
+
+
+def _quasisep_gp(params, X, diag):
+    # The kernel of GeorgeGPWrapper, exp(scale) * Matern32Kernel(length_scale**2).
+    kernel = quasisep.Matern32(
+        scale=jnp.exp(params["log_length_scale"]),
+        sigma=jnp.exp(params["log_scale"] / 2),
+    )
+    return tinygp.GaussianProcess(kernel, X, diag=diag)
+
+
+def _quasisep_neg_log_likelihood(params, X, y, diag, mask):
+    gp = _quasisep_gp(params, X, diag)
+    return _padding_log_likelihood(mask) - gp.log_probability(y)
+
+
+@jax.jit
+def _quasisep_predict(params, X, y, diag, X_pred):
+    return _quasisep_gp(params, X, diag).predict(y, X_pred, return_var=True)
+
+
+_quasisep_solver = ScipyMinimize(fun=_quasisep_neg_log_likelihood)
+
+
 class GPWrapper(ABC):
     """An abstract gaussian process regressor class."""
 
+    # A periodic model has a kernel exactly periodic in phase, with period 1,
+    # and is trained with a single phase instead of two.
+    periodic = False
+
     @abstractmethod
     def __init__(self, length_scale, period):
         pass
@@ -29,14 +139,25 @@ class GPWrapper(ABC):
     def predict(self, X_pred, return_std=True):
         pass
 
+    def _single_phase_err(self, y_err):
+        """
+        With periodic, the errors giving the same fit as the two phases: a
+        point in both phases of a periodic kernel is a single observation with
+        half the noise variance.
+        """
+        if self.periodic:
+            return y_err / np.sqrt(2)
+        return y_err
+
 
 class ScikitGPWrapper(GPWrapper, BaseEstimator, RegressorMixin):
     """A wrapper for the scikit_learn gaussian process regressor."""
 
-    def __init__(self, scale, length_scale):
+    def __init__(self, scale, length_scale, periodic=False):
         self.scale = scale
         self.length_scale = length_scale
         self.period = 1
+        self.periodic = periodic
 
     def fit(self, X, y, y_err):
         self.mag_mean = np.mean(y)
@@ -46,7 +167,9 @@ class ScikitGPWrapper(GPWrapper, BaseEstimator, RegressorMixin):
         print(y_err)
 
         kernel = np.exp(self.scale) * ExpSineSquared(np.exp(self.length_scale), self.period, periodicity_bounds="fixed")
-        self.gp = GaussianProcessRegressor(kernel=kernel, alpha=y_err**2)
+        # After the normalisation, which would undo it in y_err.
+        alpha = self._single_phase_err(y_err) ** 2
+        self.gp = GaussianProcessRegressor(kernel=kernel, alpha=alpha)
         self.gp.fit(X, y)
 
         params = self.gp.kernel_.theta
@@ -63,15 +186,28 @@ class ScikitGPWrapper(GPWrapper, BaseEstimator, RegressorMixin):
 
 
 class GeorgeGPWrapper(GPWrapper):
-    """A wrapper for the george.GP class."""
-
-    def __init__(self, scale, length_scale):
-        self.kernel = np.exp(scale) * george.kernels.Matern32Kernel(1)
+    """
+    A wrapper for the george.GP class. With periodic, the Matern32 kernel is
+    replaced by an ExpSine2 kernel with period 1.
+    """
+
+    def __init__(self, scale, length_scale, periodic=False):
+        self.periodic = periodic
+        if periodic:
+            kernel = george.kernels.ExpSine2Kernel(
+                gamma=np.exp(length_scale),
+                log_period=0.0,
+                bounds={"gamma": (1e-5, None)},
+            )
+            kernel.freeze_parameter("log_period")
+        else:
+            kernel = george.kernels.Matern32Kernel(1)
+        self.kernel = np.exp(scale) * kernel
         self.gp = george.GP(self.kernel)
         self.y = np.array([])
 
     def fit(self, X, y, y_err):
-        self.gp.compute(X, y_err)
+        self.gp.compute(X, self._single_phase_err(y_err))
         self.y = y
 
         def neg_ln_like(p):
@@ -82,8 +218,13 @@ class GeorgeGPWrapper(GPWrapper):
             self.gp.set_parameter_vector(p)
             return -self.gp.grad_log_likelihood(y)
 
+        # A negative gamma is not a valid kernel.
+        bounds = self.gp.get_parameter_bounds() if self.periodic else None
         result = minimize(
-            neg_ln_like, self.gp.get_parameter_vector(), jac=grad_neg_ln_like
+            neg_ln_like,
+            self.gp.get_parameter_vector(),
+            jac=grad_neg_ln_like,
+            bounds=bounds,
         )
 
         self.gp.set_parameter_vector(result.x)
@@ -98,49 +239,102 @@ class GeorgeGPWrapper(GPWrapper):
 class TinyGPWrapper(GPWrapper, BaseEstimator, RegressorMixin):
     """A wrapper for the tinygp.GaussianProcess class."""
 
-    def __init__(self, scale, length_scale):
+    def __init__(self, scale, length_scale, periodic=False):
         self.scale = scale
         self.length_scale = length_scale
         self.period = 1
+        self.periodic = periodic
 
     def fit(self, X, y, y_err):
         X, y = check_X_y(X, y)
-        self.X_ = X.flatten()
+        X = X.flatten()
+        y_err = self._single_phase_err(np.asarray(y_err, dtype=np.float64))
+
+        params_init = {
+            "log_scale": np.float64(self.scale),
+            "log_length_scale": np.float64(self.length_scale),
+        }
+        padded = _pad_light_curve(X, y, y_err, _bucket(len(X)))
+        solution = _tiny_solver.run(params_init, *padded, np.float64(self.period))
+
+        self._set_solution(X, y, y_err, solution.params)
+        return self
+
+    def _set_solution(self, X, y, y_err, params):
+        self.X_ = X
         self.y_ = y
         self.y_err_ = y_err
+        self.scale = params["log_scale"]
+        self.length_scale = params["log_length_scale"]
+        self.params_ = params
+        self.padded_ = _pad_light_curve(X, y, y_err, _bucket(len(X)))
+        self.is_fitted_ = True
+
+    def predict(self, X_pred, return_std=False):
+        check_is_fitted(self)
+        X_pred = check_array(X_pred).flatten()
+        # The predicted points are padded too, to reuse the compilation.
+        X, y, diag, _ = self.padded_
+        X_padded = _pad(X_pred, _bucket(len(X_pred)), 0.0)
+        pred, pred_var = _tiny_predict(
+            self.params_, X, y, diag, np.float64(self.period), X_padded
+        )
+        pred = np.asarray(pred)[: len(X_pred)]
+        pred_var = np.asarray(pred_var)[: len(X_pred)]
+        print(f"var entre {pred_var.min()} y {pred_var.max()}")
+        if return_std:
+            return pred, np.sqrt(pred_var)
+        else:
+            return pred
 
-        def build_gp(params):
-           scale = jnp.exp(params["log_scale"])
-           scale = 1
-           length_scale = jnp.exp(params["log_length_scale"])
-           kernel = scale * scale * tinygp.kernels.ExpSineSquared(gamma=length_scale, scale=self.period)
-           return tinygp.GaussianProcess(kernel, self.X_, diag=self.y_err_**2)
 
-        @jax.jit
-        def neg_log_likelihood(params):
-            gp = build_gp(params)
-            return -gp.log_probability(self.y_)
+class QuasisepGPWrapper(GPWrapper, BaseEstimator, RegressorMixin):
+    """
+    A wrapper for tinygp.GaussianProcess with the quasiseparable Matern32
+    kernel of GeorgeGPWrapper. The kernel is evaluated on the sorted phases, so
+    fitting and predicting cost O(N) instead of the O(N^3) of the dense
+    solvers.
+    """
+
+    def __init__(self, scale, length_scale):
+        self.scale = scale
+        self.length_scale = length_scale
 
+    def fit(self, X, y, y_err):
+        X, y = check_X_y(X, y)
+        order = np.argsort(X.flatten(), kind="stable")
+        self.X_ = X.flatten()[order]
+        self.y_ = y[order]
+        self.y_err_ = np.asarray(y_err, dtype=np.float64)[order]
+
+        # The padding is added after the last phase to keep them sorted.
+        self.padded_ = _pad_light_curve(
+            self.X_, self.y_, self.y_err_, _bucket(len(self.X_)), self.X_[-1]
+        )
         params_init = {
             "log_scale": np.float64(self.scale),
             "log_length_scale": np.float64(self.length_scale),
         }
+        self.params_ = _quasisep_solver.run(params_init, *self.padded_).params
 
-        solver = ScipyMinimize(fun=neg_log_likelihood)
-        solution = solver.run(params_init)
-
-        self.scale = solution.params["log_scale"]
-        self.length_scale = solution.params["log_length_scale"]
-
-        self.gp = build_gp(solution.params)
+        self.scale = self.params_["log_scale"]
+        self.length_scale = self.params_["log_length_scale"]
         self.is_fitted_ = True
         return self
 
     def predict(self, X_pred, return_std=False):
         check_is_fitted(self)
-        X_pred = check_array(X_pred)
-        pred, pred_var = self.gp.predict(self.y_, X_pred.flatten(), return_var=True)
-        print(f"var entre {pred_var.min()} y {pred_var.max()}")
+        X_pred = check_array(X_pred).flatten()
+        order = np.argsort(X_pred, kind="stable")
+        X, y, diag, _ = self.padded_
+        X_padded = _pad(X_pred[order], _bucket(len(X_pred)), X_pred.max())
+        mean, var = _quasisep_predict(self.params_, X, y, diag, X_padded)
+
+        # Back to the order of X_pred.
+        pred = np.empty(len(X_pred))
+        pred_var = np.empty(len(X_pred))
+        pred[order] = np.asarray(mean)[: len(X_pred)]
+        pred_var[order] = np.asarray(var)[: len(X_pred)]
         if return_std:
             return pred, np.sqrt(pred_var)
         else:
@@ -1,12 +1,16 @@
 import numpy as np
 import pandas as pd
 
-from feets import FeatureSpace
 from PyAstronomy.pyasl import foldAt
 from typing import Optional
 
-import light_curve.feets_patch
+from light_curve.feets_patch import estimate_period
 from light_curve.gp_wrapper import GPWrapper, GeorgeGPWrapper
+from light_curve.periodogram import (
+    IncrementalLombScargle,
+    narrow_band_grid,
+    narrow_band_period,
+)
 
 
 class LightCurve:
@@ -19,9 +23,19 @@ class LightCurve:
         id: int = -1,
         model: Optional[GPWrapper] = None,
         seed: int = 999,
+        narrow_band: Optional[dict] = None,
+        incremental: bool = False,
     ):
         self.period_catalog = period_catalog
         self.id = id
+        # Arguments of narrow_band_period, if the period is only searched
+        # around period_catalog.
+        self.narrow_band = narrow_band
+        self.drift = 0.0
+        # With incremental the periodogram is updated as observations are
+        # added instead of being recomputed.
+        self.incremental = incremental
+        self.periodogram = None
 
         if model is None:
             self.model = GeorgeGPWrapper()
@@ -30,23 +44,51 @@ class LightCurve:
 
         self.rng = np.random.default_rng(seed)
 
-        self.hjd = lc.hjd.to_numpy()
-        self.mag = lc.mag.to_numpy()
-        self.err = lc.err.to_numpy()
+        # lc can be a dataframe or a star from a StarIndex.
+        self.hjd = np.array(lc["hjd"])
+        self.mag = np.array(lc["mag"])
+        self.err = np.array(lc["err"])
         self.synth = np.full_like(self.hjd, False, dtype=bool)
         self.mean_mag = np.mean(self.mag)
         self.dirty = False
 
-        self.fs = FeatureSpace(only=["PeriodLS", "Period_fit"])
         self.period = period_catalog
 
         self._make_periodic()
 
-    """Use Lomb-Scargle to obtain the period using the hjd representation."""
+    """
+    Use Lomb-Scargle to obtain the period using the hjd representation. The
+    period_fit is None unless with_fap. With narrow_band or incremental it
+    returns the power of the peak instead of the period_fit, and stores the
+    drift from period_catalog.
+    """
 
-    def _calculate_period(self):
-        _, values = self.fs.extract(time=self.hjd, magnitude=self.mag, error=self.err)
-        return values[0], values[1]
+    def _calculate_period(self, with_fap=True):
+        if self.incremental:
+            if self.periodogram is None:
+                frequency = None
+                if self.narrow_band is not None:
+                    frequency = narrow_band_grid(
+                        1.0 / self.period_catalog,
+                        np.ptp(self.hjd),
+                        **self.narrow_band,
+                    )
+                self.periodogram = IncrementalLombScargle(
+                    self.hjd, self.mag, self.err, frequency
+                )
+            period, power = self.periodogram.best_period()
+            self.drift = period / self.period_catalog - 1
+            return period, power
+
+        if self.narrow_band is not None:
+            period, power, self.drift = narrow_band_period(
+                self.hjd, self.mag, self.err, self.period_catalog, **self.narrow_band
+            )
+            return period, power
+
+        if not with_fap:
+            return estimate_period(self.hjd, self.mag, self.err), None
+        return estimate_period(self.hjd, self.mag, self.err, with_fap=True)
 
     """Generate the periodic representation with the current period and the hjd representation."""
 
@@ -58,26 +100,37 @@ class LightCurve:
 
     def update(self):
         if self.dirty:
-            self.make_periodic()
+            self.make_periodic(with_fap=False)
             self.mean_mag = np.mean(self.mag)
             self.dirty = False
 
-    """Train the model using the periodic representation."""
+    """
+    Returns the phase, mag and err the model is trained with. A periodic model
+    is trained with a single phase.
+    """
 
-    def _train(self):
+    def _training_set(self):
         self.update()
 
+        if self.model.periodic:
+            return self.phase.reshape(-1, 1), self.mag - self.mean_mag, self.err
+
         # We use two phases to make sure that the gp models a periodic
         # function.
         phase = np.append(self.phase, self.phase + 1).reshape(-1, 1)
         mag = np.append(self.mag, self.mag) - self.mean_mag
         err = np.append(self.err, self.err)
-        self.model.fit(phase, mag, err)
+        return phase, mag, err
 
-    """Selects a hjd for synthetic observation generation."""
+    """Train the model using the periodic representation."""
+
+    def _train(self):
+        self.model.fit(*self._training_set())
 
-    def _select_hjd(self):
-        return self.rng.uniform(low=self.hjd.min(), high=self.hjd.max())
+    """Selects a hjd, or an array of n, for synthetic observation generation."""
+
+    def _select_hjd(self, n=None):
+        return self.rng.uniform(low=self.hjd.min(), high=self.hjd.max(), size=n)
 
     """Returns the phase of the given hjd with the current period."""
 
@@ -86,40 +139,46 @@ class LightCurve:
         epoch = np.floor((hjd - self.hjd[min_idx]) / self.period)
         return (hjd - self.hjd[min_idx]) / self.period - epoch
 
-    """Adds an observation to the hjd representation."""
+    """Adds an observation, or arrays of them, to the hjd representation."""
 
     def _add_hjd_observation(self, hjd, mag, err):
         self.hjd = np.append(self.hjd, hjd)
         self.mag = np.append(self.mag, mag)
         self.err = np.append(self.err, err)
-        self.synth = np.append(self.synth, True)
+        self.synth = np.append(self.synth, np.full(np.size(hjd), True))
+        if self.periodogram is not None:
+            self.periodogram.add(hjd, mag, err)
         self.dirty = True
 
-    """Generates a single synthetic observation."""
-
-    def _add_single_synthetic(self):
-        hjd = self._select_hjd()
-        phase = self._hjd_to_phase(hjd)
-        mean, std = self.model.predict(np.reshape(phase, (-1, 1)), return_std=True)
-        self._add_hjd_observation(hjd, mean[0] + self.mean_mag, std[0])
-
     """
     Generates n_synthetic observations using a random hjd. pmag and perr are obtained from
     the model.
+    The observations are predicted together, as if they were added one at a time.
     """
 
     def add_synthetic(self, n_synthetic):
         self._train()
-        for _ in range(n_synthetic):
-            self._add_single_synthetic()
+        hjd = self._select_hjd(n_synthetic)
+        while len(hjd):
+            phase = self._hjd_to_phase(hjd)
+            mean, std = self.model.predict(phase.reshape(-1, 1), return_std=True)
+            mag = mean + self.mean_mag
+            # The phases are folded from the minimum magnitude, so those after
+            # a synthetic one below it are predicted again.
+            below = np.flatnonzero(mag < self.mag.min())
+            n = below[0] + 1 if len(below) else len(hjd)
+            self._add_hjd_observation(hjd[:n], mag[:n], std[:n])
+            hjd = hjd[n:]
 
     """
     Calculates the period using the hjd representation. Using both, calculates the periodic representation.
     Returns the calculated period and the period_fit (from Lomb-Scargle).
+    With narrow_band or incremental the power of the peak is returned instead
+    of the period_fit.
     """
 
-    def make_periodic(self):
-        self.period, period_fit = self._calculate_period()
+    def make_periodic(self, with_fap=True):
+        self.period, period_fit = self._calculate_period(with_fap)
         self._make_periodic()
         return self.period, period_fit
 
@@ -133,8 +192,9 @@ class LightCurve:
         tuple_list = self.rng.permutation(tuple_list)
         sample = sorted(tuple_list[:n_sample], key=lambda x: x[1])
         self.hjd, self.mag, self.err = [np.array(l) for l in zip(*sample)]
+        self.periodogram = None
         self.dirty = True
-        self.make_periodic()
+        self.make_periodic(with_fap=False)
 
     """
     Removes the observations with a signal-to-noise ratio lower than SNR.
@@ -148,6 +208,7 @@ class LightCurve:
         self.err = self.err[filtered]
         self.synth = self.synth[filtered]
 
+        self.periodogram = None
         self.dirty = True
 
     """
@@ -1,18 +1,23 @@
-import feets
-import light_curve.feets_patch
 import numpy as np
 import pandas as pd
 
 from feets.preprocess import remove_noise
 
+from light_curve.feets_patch import estimate_period
+from light_curve.periodogram import IncrementalLombScargle
+
 
 class LightCurveSampler:
     """A class for generating subsamples of light curves."""
 
-    def __init__(self, lc, period_catalog, id=-1, seed=999):
+    def __init__(self, lc, period_catalog, id=-1, seed=999, incremental=False):
         self.period_catalog = period_catalog
         self.id = id
         self.period = period_catalog
+        # With incremental the periodogram is updated as observations are
+        # removed instead of being recomputed.
+        self.incremental = incremental
+        self.periodogram = None
 
         # Randomly shuffle the observations.
         self.rng = np.random.default_rng(seed)
@@ -30,18 +35,34 @@ class LightCurveSampler:
         self.hjd, self.mag, self.err = [np.array(l) for l in zip(*tuple_list)]
         self.n_original_obs = len(self.hjd)
 
-        self.fs = feets.FeatureSpace(only=["PeriodLS", "Period_fit"])
+    def calculate_period(self, with_fap=True):
+        """
+        Uses Lomb-Scargle to obtain the period. The period_fit is None unless
+        with_fap. With incremental it returns the power of the peak instead of
+        the period_fit.
+        """
+        if self.incremental:
+            if self.periodogram is None:
+                self.periodogram = IncrementalLombScargle(self.hjd, self.mag, self.err)
+            self.period, power = self.periodogram.best_period()
+            return self.period, power
 
-    def calculate_period(self):
-        """Uses Lomb-Scargle to obtain the period."""
-        _, values = self.fs.extract(self.hjd, self.mag, self.err)
-        self.period = values[0]
-        return values[0], values[1]
+        if not with_fap:
+            self.period = estimate_period(self.hjd, self.mag, self.err)
+            return self.period, None
+        self.period, period_fit = estimate_period(
+            self.hjd, self.mag, self.err, with_fap=True
+        )
+        return self.period, period_fit
 
     def subsample(self, n_sample: int):
         """
         Generates a subsample of the light curve of size n_sample by deleting the last points.
         """
+        if self.periodogram is not None:
+            self.periodogram.remove(
+                self.hjd[n_sample:], self.mag[n_sample:], self.err[n_sample:]
+            )
         self.hjd = self.hjd[:n_sample]
         self.mag = self.mag[:n_sample]
         self.err = self.err[:n_sample]
@@ -57,10 +78,12 @@ class LightCurveSampler:
             self.hjd, self.mag, self.err = [np.array(l) for l in zip(*filtered)]
         else:
             self.hjd, self.mag, self.err = [], [], []
+        self.periodogram = None
 
     def filter_sigma_clipping(self):
         """Uses feets to remove noisy points using sigma clipping."""
         self.hjd, self.mag, self.err = remove_noise(self.hjd, self.mag, self.err)
+        self.periodogram = None
 
     """
     Returns the light curve as a dataframe.
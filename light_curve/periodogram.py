@@ -0,0 +1,388 @@
+import math
+import numpy as np
+
+# =============================================================================
+# CONSTANTS
+# =============================================================================
+
+MINIMUM_FREQUENCY = 1.0 / 200
+MAXIMUM_FREQUENCY = 10.0
+SAMPLES_PER_PEAK = 5
+
+METHODS = ("fast", "exact")
+
+# Maximum number of complex values held at once by a block of the computation.
+MAX_ELEMENTS = 2**22
+
+# Aliases searched by narrow_band_period: multiples of the reference frequency
+# and daily aliases (offsets in cycles per day).
+ALIAS_FACTORS = (1.0, 0.5, 2.0)
+ALIAS_OFFSETS = (0.0, -1.0, 1.0)
+
+# Press & Rybicki extirpolation settings, the defaults of astropy.
+OVERSAMPLING = 5
+EXTIRPOLATION_ORDER = 4
+
+
+# =============================================================================
+# FUNCTIONS
+# =============================================================================
+
+
+def _grid_step(
+    baseline,
+    minimum_frequency=MINIMUM_FREQUENCY,
+    maximum_frequency=MAXIMUM_FREQUENCY,
+    samples_per_peak=SAMPLES_PER_PEAK,
+):
+    """Returns the step and the number of frequencies of frequency_grid."""
+    df = 1.0 / (samples_per_peak * baseline)
+    return df, 1 + int(np.round((maximum_frequency - minimum_frequency) / df))
+
+
+def frequency_grid(
+    baseline,
+    minimum_frequency=MINIMUM_FREQUENCY,
+    maximum_frequency=MAXIMUM_FREQUENCY,
+    samples_per_peak=SAMPLES_PER_PEAK,
+):
+    """
+    Returns the uniform frequency grid astropy's autofrequency builds for a
+    light curve spanning baseline days.
+    """
+    df, n_frequencies = _grid_step(
+        baseline, minimum_frequency, maximum_frequency, samples_per_peak
+    )
+    return minimum_frequency + df * np.arange(n_frequencies)
+
+
+def _uniform_step(frequency):
+    """Returns the step of a uniform frequency grid, or None if it is not one."""
+    if len(frequency) < 2:
+        return None
+    step = frequency[1] - frequency[0]
+    uniform = frequency[0] + step * np.arange(len(frequency))
+    if step <= 0 or not np.allclose(frequency, uniform, rtol=1e-9, atol=0):
+        return None
+    return step
+
+
+def _fft_size(n_frequencies):
+    return 1 << (int(n_frequencies * OVERSAMPLING) - 1).bit_length()
+
+
+def _weighted_data(time, magnitude, error):
+    """Returns the shifted times, normalized weights and centered magnitudes."""
+    time = np.ravel(np.asarray(time, dtype=float))
+    w = 1.0 / np.ravel(np.asarray(error, dtype=float)) ** 2
+    w /= w.sum()
+    y = np.ravel(np.asarray(magnitude, dtype=float))
+    y = y - np.dot(w, y)
+    return time - time.min(), w, y
+
+
+def _power_from_sums(wz, wyz, wz2, yy):
+    """
+    Returns the floating mean Lomb-Scargle power with standard normalization
+    from the weighted sums of z = exp(2i pi f t), y z and z^2.
+    """
+    C, S = wz.real, wz.imag
+    YC, YS = wyz.real, wyz.imag
+    CC = 0.5 * (1 + wz2.real) - C * C
+    SS = 0.5 * (1 - wz2.real) - S * S
+    CS = 0.5 * wz2.imag - C * S
+    D = CC * SS - CS * CS
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return (SS * YC * YC + CC * YS * YS - 2 * CS * YC * YS) / (yy * D)
+
+
+def _iter_exponentials(t, frequency, max_elements):
+    """
+    Yields (start, z) with z = exp(2i pi f t) for blocks of frequencies
+    f = frequency[start : start + len(z)]. On a uniform grid every block is
+    the first one times a phase, so only one exponential per observation is
+    computed for each block.
+    """
+    block = min(max(1, max_elements // len(t)), len(frequency))
+    step = _uniform_step(frequency)
+    if step is not None:
+        offsets = np.exp(2j * np.pi * np.outer(step * np.arange(block), t))
+
+    for start in range(0, len(frequency), block):
+        f = frequency[start : start + block]
+        if step is not None:
+            yield start, offsets[: len(f)] * np.exp(2j * np.pi * f[0] * t)
+        else:
+            yield start, np.exp(2j * np.pi * np.outer(f, t))
+
+
+def _extirpolate(x, y, row, n_rows, n, order=EXTIRPOLATION_ORDER):
+    """
+    Spreads the values y at the positions x of the given rows of an (n_rows, n)
+    grid so that sums of y times smooth functions of x are preserved, as in
+    Press & Rybicki (1989).
+    """
+    idx, values = [], []
+    exact = x % 1 == 0
+    idx.append(row[exact] * n + x[exact].astype(int))
+    values.append(y[exact])
+    x, y, row = x[~exact], y[~exact], row[~exact]
+
+    low = np.clip((x - order // 2).astype(int), 0, n - order)
+    numerator = y * np.prod(x - low - np.arange(order)[:, np.newaxis], axis=0)
+    denominator = math.factorial(order - 1)
+    for j in range(order):
+        if j > 0:
+            denominator *= j / (j - order)
+        position = low + (order - 1 - j)
+        idx.append(row * n + position)
+        values.append(numerator / (denominator * (x - position)))
+
+    # The grid is much larger than the values, so they are added in place.
+    result = np.zeros(n_rows * n, dtype=complex)
+    np.add.at(result, np.concatenate(idx), np.concatenate(values))
+    return result.reshape(n_rows, n)
+
+
+def _fast_sums(t, h, row, f0, df, n_rows, n_fft, n_frequencies):
+    """
+    Returns the (n_rows, n_frequencies) sums of h exp(2i pi f t) of every row
+    for f = f0 + df k, approximated with an FFT of size n_fft of the
+    extirpolated values. df can be given per value, for rows on different
+    grids.
+    """
+    h = h * np.exp(2j * np.pi * f0 * t)
+    grid = _extirpolate((t * n_fft * df) % n_fft, h, row, n_rows, n_fft)
+    return np.fft.ifft(grid, axis=1, norm="forward")[:, :n_frequencies]
+
+
+def _groups(sizes, max_elements):
+    """
+    Groups the items of equal size, so the sizes of a group add up to at most
+    max_elements unless it has a single item.
+    """
+    groups = []
+    for size in sorted(set(sizes)):
+        items = [idx for idx, s in enumerate(sizes) if s == size]
+        per_group = max(1, max_elements // size)
+        groups += [items[i : i + per_group] for i in range(0, len(items), per_group)]
+    return groups
+
+
+def lscargle_power(time, magnitude, error, frequency, max_elements=MAX_ELEMENTS):
+    """
+    Returns the exact power of a single light curve at the given frequencies,
+    with the same model as astropy's LombScargle(time, magnitude, error) and
+    normalization="standard".
+    """
+    t, w, y = _weighted_data(time, magnitude, error)
+    yy = np.dot(w, y * y)
+    frequency = np.asarray(frequency, dtype=float)
+    power = np.empty(len(frequency))
+    for start, z in _iter_exponentials(t, frequency, max_elements):
+        power[start : start + len(z)] = _power_from_sums(
+            z @ w, z @ (w * y), (z * z) @ w, yy
+        )
+    return power
+
+
+def batch_lscargle(
+    times, magnitudes, errors, frequency=None, method="fast", max_elements=MAX_ELEMENTS
+):
+    """
+    Evaluates the Lomb-Scargle periodogram of many light curves and returns
+    the best period and its power for each of them.
+
+    times, magnitudes and errors are sequences with one array per star. By
+    default every star uses frequency_grid of its own baseline, the grid of
+    astropy's autopower, and method="fast" is the same FFT approximation as
+    astropy's fast method, so the periods are those of estimate_period. The
+    stars whose grids need the same FFT size are transformed together, in
+    groups that hold at most max_elements values at once. A shared frequency
+    grid can be given instead, which must be uniform for method="fast", while
+    method="exact" evaluates the sums directly at any frequencies. Stars
+    without a finite power, like constant ones, get nan.
+    """
+    if method not in METHODS:
+        raise ValueError(f"Unknown method '{method}', expected one of {METHODS}.")
+
+    data = [_weighted_data(t, m, e) for t, m, e in zip(times, magnitudes, errors)]
+    n_stars = len(data)
+    best_period = np.full(n_stars, np.nan)
+    best_power = np.full(n_stars, np.nan)
+
+    if method == "exact":
+        for idx, (t, m, e) in enumerate(zip(times, magnitudes, errors)):
+            f = frequency
+            if f is None:
+                f = frequency_grid(np.ptp(data[idx][0]))
+            power = lscargle_power(t, m, e, f, max_elements)
+            if np.isfinite(power).any():
+                fmax = np.nanargmax(power)
+                best_period[idx] = 1.0 / f[fmax]
+                best_power[idx] = power[fmax]
+        return best_period, best_power
+
+    if frequency is None:
+        f0 = MINIMUM_FREQUENCY
+        steps = [_grid_step(t.max()) for t, _, _ in data]
+    else:
+        frequency = np.asarray(frequency, dtype=float)
+        df = _uniform_step(frequency)
+        if df is None:
+            raise ValueError("The fast method needs a uniform frequency grid.")
+        f0 = frequency[0]
+        steps = [(df, len(frequency))] * n_stars
+    df = np.array([step for step, _ in steps])
+    n_frequencies = np.array([n for _, n in steps])
+    n_fft = [_fft_size(n) for n in n_frequencies]
+
+    for group in _groups(n_fft, max_elements):
+        lengths = [len(data[idx][0]) for idx in group]
+        t = np.concatenate([data[idx][0] for idx in group])
+        w = np.concatenate([data[idx][1] for idx in group])
+        wy = np.concatenate([data[idx][1] * data[idx][2] for idx in group])
+        yy = np.array([np.dot(data[idx][1], data[idx][2] ** 2) for idx in group])
+        row = np.repeat(np.arange(len(group)), lengths)
+        step = df[group][row]
+        shape = (len(group), n_fft[group[0]], n_frequencies[group].max())
+
+        wz = _fast_sums(t, w, row, f0, step, *shape)
+        wyz = _fast_sums(t, wy, row, f0, step, *shape)
+        # z^2 is the exponential at twice the frequency.
+        wz2 = _fast_sums(t, w, row, 2 * f0, 2 * step, *shape)
+        power = _power_from_sums(wz, wyz, wz2, yy[:, np.newaxis])
+
+        # Rows on shorter grids are padded past their last frequency.
+        k = np.arange(power.shape[1])
+        valid = np.isfinite(power) & (k < n_frequencies[group][:, np.newaxis])
+        power = np.where(valid, power, -np.inf)
+        fmax = power.argmax(axis=1)
+        group_best = power[np.arange(len(group)), fmax]
+        found = np.isfinite(group_best)
+        best_period[group] = np.where(found, 1.0 / (f0 + df[group] * fmax), np.nan)
+        best_power[group] = np.where(found, group_best, np.nan)
+
+    return best_period, best_power
+
+
+def narrow_band_grid(
+    reference_frequency,
+    baseline,
+    half_width=5,
+    factors=ALIAS_FACTORS,
+    offsets=ALIAS_OFFSETS,
+    samples_per_peak=SAMPLES_PER_PEAK,
+    minimum_frequency=MINIMUM_FREQUENCY,
+    maximum_frequency=MAXIMUM_FREQUENCY,
+):
+    """
+    Returns the frequencies within half_width peak widths (1 / baseline) of
+    factor * reference_frequency + offset for every factor and offset, with
+    the resolution of frequency_grid.
+    """
+    df = 1.0 / (samples_per_peak * baseline)
+    n_steps = half_width * samples_per_peak
+    window = df * np.arange(-n_steps, n_steps + 1)
+    centers = np.add.outer(np.multiply(factors, reference_frequency), offsets)
+    frequency = np.unique(np.add.outer(centers.ravel(), window))
+    return frequency[
+        (frequency >= minimum_frequency) & (frequency <= maximum_frequency)
+    ]
+
+
+def narrow_band_period(time, magnitude, error, reference_period, **grid_kwds):
+    """
+    Searches the best period only around reference_period and its aliases,
+    see narrow_band_grid. Returns the period, its exact power and the drift
+    period / reference_period - 1.
+    """
+    time = np.ravel(time)
+    frequency = narrow_band_grid(
+        1.0 / reference_period, time.max() - time.min(), **grid_kwds
+    )
+    power = lscargle_power(time, magnitude, error, frequency)
+    if not len(frequency) or not np.isfinite(power).any():
+        return np.nan, np.nan, np.nan
+    fmax = np.nanargmax(power)
+    period = 1.0 / frequency[fmax]
+    return period, power[fmax], period / reference_period - 1
+
+
+# =============================================================================
+# INCREMENTAL PERIODOGRAM CLASS
+# =============================================================================
+
+
+class IncrementalLombScargle:
+    """
+    The Lomb-Scargle periodogram of a light curve on a fixed frequency grid
+    (frequency_grid of the initial baseline by default), keeping the weighted
+    sums of every frequency. Adding or removing observations updates the sums
+    in O(n_frequencies) per observation instead of recomputing the whole
+    periodogram. The power is the same as lscargle_power up to rounding.
+    """
+
+    def __init__(
+        self, time, magnitude, error, frequency=None, max_elements=MAX_ELEMENTS
+    ):
+        t, w, y = _weighted_data(time, magnitude, error)
+        # Reference time and magnitude, to keep the sums well conditioned.
+        self.t0 = np.min(time)
+        self.m0 = np.dot(w, np.ravel(magnitude))
+        if frequency is None:
+            frequency = frequency_grid(t.max())
+        self.frequency = np.asarray(frequency, dtype=float)
+        self.max_elements = max_elements
+        self.n_observations = 0
+
+        self._w = 0.0
+        self._wm = 0.0
+        self._wm2 = 0.0
+        self._wz = np.zeros(len(self.frequency), dtype=complex)
+        self._wmz = np.zeros(len(self.frequency), dtype=complex)
+        self._wz2 = np.zeros(len(self.frequency), dtype=complex)
+        self.add(time, magnitude, error)
+
+    def _update(self, time, magnitude, error, sign):
+        time = np.ravel(np.asarray(time, dtype=float)) - self.t0
+        m = np.ravel(np.asarray(magnitude, dtype=float)) - self.m0
+        w = sign / np.ravel(np.asarray(error, dtype=float)) ** 2
+        if not len(time):
+            return
+
+        self.n_observations += sign * len(time)
+        self._w += w.sum()
+        self._wm += np.dot(w, m)
+        self._wm2 += np.dot(w, m * m)
+        for start, z in _iter_exponentials(time, self.frequency, self.max_elements):
+            end = start + len(z)
+            self._wz[start:end] += z @ w
+            self._wmz[start:end] += z @ (w * m)
+            self._wz2[start:end] += (z * z) @ w
+
+    def add(self, time, magnitude, error):
+        """Adds the given observations (scalars or arrays)."""
+        self._update(time, magnitude, error, 1)
+
+    def remove(self, time, magnitude, error):
+        """Removes the given observations, which must have been added before."""
+        self._update(time, magnitude, error, -1)
+
+    def power(self):
+        """Returns the power at every frequency, as lscargle_power."""
+        mean = self._wm / self._w
+        return _power_from_sums(
+            self._wz / self._w,
+            (self._wmz - mean * self._wz) / self._w,
+            self._wz2 / self._w,
+            self._wm2 / self._w - mean * mean,
+        )
+
+    def best_period(self):
+        """Returns the period with the highest power and its power."""
+        power = self.power()
+        if not np.isfinite(power).any():
+            return np.nan, np.nan
+        fmax = np.nanargmax(power)
+        return 1.0 / self.frequency[fmax], power[fmax]
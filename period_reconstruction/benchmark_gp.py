@@ -0,0 +1,77 @@
+import numpy as np
+import time
+
+from light_curve.gp_wrapper import (
+    GeorgeGPWrapper,
+    QuasisepGPWrapper,
+    ScikitGPWrapper,
+    TinyGPWrapper,
+    enable_compilation_cache,
+)
+
+# Parameters.
+# Number of observations of the synthetic light curves, trained with two phases.
+sizes = [100, 200, 400, 800]
+# Number of phases predicted, as for the synthetic observations.
+n_pred = 100
+# Each backend is timed repeat times per size, keeping the best.
+repeat = 3
+# The dense scikit-learn solver is too slow for the largest sizes.
+max_scikit_size = 400
+seed = 0
+
+rng = np.random.default_rng(seed)
+backends = {
+    "george": lambda: GeorgeGPWrapper(0.0, 0.0),
+    "scikit": lambda: ScikitGPWrapper(1.0, 1.0),
+    "tiny": lambda: TinyGPWrapper(0.0, 0.0),
+    "quasisep": lambda: QuasisepGPWrapper(0.0, 0.0),
+}
+# Reuse the tinygp compilations of earlier runs, which would be timed otherwise.
+enable_compilation_cache()
+
+
+def light_curve(n):
+    phase = rng.random(n)
+    mag = 0.3 * np.sin(2 * np.pi * phase) + 0.1 * np.sin(4 * np.pi * phase)
+    err = rng.uniform(0.02, 0.08, n)
+    mag = mag + rng.normal(0, err)
+    # We use two phases as LightCurve does.
+    X = np.append(phase, phase + 1).reshape(-1, 1)
+    return X, np.append(mag, mag), np.append(err, err)
+
+
+def fit_predict(make_model, X, y, y_err, X_pred):
+    best = np.inf
+    for _ in range(repeat):
+        start = time.perf_counter()
+        model = make_model()
+        model.fit(X, y, y_err)
+        mean, std = model.predict(X_pred, return_std=True)
+        best = min(best, time.perf_counter() - start)
+    return best, mean, std
+
+
+file = open("gp_benchmark.csv", "w")
+file.write("n,backend,seconds,max_mean_diff,max_std_diff\n")
+
+print(f"{'n':>6} {'backend':>9} {'seconds':>9} {'mean diff':>10} {'std diff':>10}")
+for n in sizes:
+    X, y, y_err = light_curve(n)
+    X_pred = rng.random(n_pred).reshape(-1, 1)
+    results = {}
+    for name, make_model in backends.items():
+        if name == "scikit" and n > max_scikit_size:
+            continue
+        results[name] = fit_predict(make_model, X, y, y_err, X_pred)
+
+    # The differences are measured against george, which has the same kernel
+    # as quasisep.
+    _, george_mean, george_std = results["george"]
+    for name, (seconds, mean, std) in results.items():
+        mean_diff = np.max(np.abs(mean - george_mean))
+        std_diff = np.max(np.abs(std - george_std))
+        file.write(f"{n},{name},{seconds},{mean_diff},{std_diff}\n")
+        print(f"{n:>6} {name:>9} {seconds:>9.3f} {mean_diff:>10.2e} {std_diff:>10.2e}")
+
+file.close()
@@ -0,0 +1,77 @@
+import numpy as np
+import sys
+import time
+import warnings
+
+from catalog.catalog_loader import CatalogLoader
+from light_curve.feets_patch import lscargle_error
+
+warnings.filterwarnings("ignore")
+
+# Parameters.
+tile = sys.argv[1]
+# Arguments of adaptive_autopower, the same for every star.
+search_kwds = {"n_peaks": 5, "coarsening": 5}
+# Relative difference between the periods to count them as different.
+tolerance = 1e-3
+autopower_kwds = {
+    "normalization": "standard",
+    "maximum_frequency": 10.0,
+    "minimum_frequency": 1.0 / 200,
+}
+
+# Compare the classified stars of the tile.
+loader = CatalogLoader("../catalog")
+features_df = loader.get_features(tile, columns=["id", "vs_type"])
+features_df = features_df[features_df.vs_type.notna() & (features_df.vs_type != "")]
+lc_index = loader.get_star_index(tile, filters=[("id", "in", features_df.id.to_list())])
+
+file = open(f"adaptive_period_{tile}.csv", "w")
+file.write("id,vs_type,period_dense,period_adaptive,time_dense,time_adaptive\n")
+
+n_stars = 0
+n_different = 0
+total_dense = 0
+total_adaptive = 0
+for _, star in features_df.iterrows():
+    if star.id not in lc_index:
+        continue
+    lc = lc_index.get_star(star.id)
+
+    start = time.perf_counter()
+    frequency, _, fmax = lscargle_error(
+        lc["hjd"], lc["mag"], lc["err"], autopower_kwds=autopower_kwds
+    )
+    time_dense = time.perf_counter() - start
+    period_dense = 1 / frequency[fmax]
+
+    start = time.perf_counter()
+    frequency, _, fmax = lscargle_error(
+        lc["hjd"],
+        lc["mag"],
+        lc["err"],
+        autopower_kwds=autopower_kwds,
+        search_kwds=search_kwds,
+    )
+    time_adaptive = time.perf_counter() - start
+    period_adaptive = 1 / frequency[fmax]
+
+    n_stars += 1
+    if np.abs(period_adaptive - period_dense) > tolerance * period_dense:
+        n_different += 1
+    total_dense += time_dense
+    total_adaptive += time_adaptive
+    file.write(
+        f"{star.id},{star.vs_type},{period_dense},{period_adaptive},"
+        f"{time_dense},{time_adaptive}\n"
+    )
+
+file.close()
+print(
+    f"PeriodLS differs in {n_different} of {n_stars} stars "
+    f"({100 * n_different / max(n_stars, 1):.2f}%)."
+)
+print(
+    f"Dense: {total_dense:.1f} s, adaptive: {total_adaptive:.1f} s "
+    f"(speedup {total_dense / max(total_adaptive, 1e-12):.1f}x)."
+)
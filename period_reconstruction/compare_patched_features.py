@@ -0,0 +1,142 @@
+import numpy as np
+import sys
+import time
+import warnings
+
+from feets.extractors import (
+    ext_amplitude,
+    ext_flux_percentile_ratio,
+    ext_median_abs_dev,
+    ext_median_brp,
+    ext_percent_amplitude,
+    ext_percent_difference_flux_percentile,
+    ext_q31,
+)
+
+from catalog.catalog_loader import CatalogLoader
+from light_curve.feets_patch import (
+    FourierComponentsWithError,
+    OrderStatistics,
+    clear_periodogram_cache,
+)
+
+warnings.filterwarnings("ignore")
+
+# Parameters.
+tile = sys.argv[1]
+# Absolute difference between two values to count them as different. curve_fit
+# stops at its own tolerance, around 1e-6 in the amplitudes.
+tolerance = 1e-5
+# The feets extractors OrderStatistics replaces, except Gskew (see gskew).
+references = [
+    ext_amplitude.Amplitude,
+    ext_flux_percentile_ratio.FluxPercentileRatioMid20,
+    ext_flux_percentile_ratio.FluxPercentileRatioMid35,
+    ext_flux_percentile_ratio.FluxPercentileRatioMid50,
+    ext_flux_percentile_ratio.FluxPercentileRatioMid65,
+    ext_flux_percentile_ratio.FluxPercentileRatioMid80,
+    ext_median_abs_dev.MedianAbsDev,
+    ext_median_brp.MedianBRP,
+    ext_percent_amplitude.PercentAmplitude,
+    ext_percent_difference_flux_percentile.PercentDifferenceFluxPercentile,
+    ext_q31.Q31,
+]
+order_params = OrderStatistics.get_default_params()
+fourier_params = FourierComponentsWithError.get_default_params()
+
+
+def gskew(magnitude, interpolation):
+    """The Gskew of feets, with the percentiles of the given interpolation."""
+    median_mag = np.median(magnitude)
+    F_3_value = np.percentile(magnitude, 3, interpolation=interpolation)
+    F_97_value = np.percentile(magnitude, 97, interpolation=interpolation)
+    return (
+        np.median(magnitude[magnitude <= F_3_value])
+        + np.median(magnitude[magnitude >= F_97_value])
+        - 2 * median_mag
+    )
+
+
+def max_order_diff(magnitude):
+    """Returns the largest difference of the OrderStatistics features."""
+    expected = {"Gskew": gskew(magnitude, order_params["interpolation"])}
+    for extractor in references:
+        expected.update(extractor().fit(magnitude=magnitude))
+    result = OrderStatistics().fit(magnitude=magnitude, **order_params)
+    return max(abs(result[name] - value) for name, value in expected.items())
+
+
+def fourier(lc, linear_fit):
+    # Each fit computes its own periodogram, so both are timed the same way.
+    clear_periodogram_cache()
+    params = dict(fourier_params, linear_fit=linear_fit)
+    start = time.perf_counter()
+    result = FourierComponentsWithError().fit(
+        magnitude=lc["mag"], time=lc["hjd"], error=lc["err"], **params
+    )
+    return time.perf_counter() - start, result
+
+
+def max_fourier_diffs(curve_fit_result, linear_result):
+    """
+    Returns the largest differences of the harmonic amplitudes and of the
+    relative phases. The phases come from an arctan, so they are compared
+    modulo pi.
+    """
+    amplitude_diff, phase_diff = 0.0, 0.0
+    for name, value in curve_fit_result.items():
+        diff = linear_result[name] - value
+        if "amplitude" in name:
+            amplitude_diff = max(amplitude_diff, abs(diff))
+        else:
+            phase_diff = max(phase_diff, abs((diff + np.pi / 2) % np.pi - np.pi / 2))
+    return amplitude_diff, phase_diff
+
+
+# Compare the classified stars of the tile.
+loader = CatalogLoader("../catalog")
+features_df = loader.get_features(tile, columns=["id", "vs_type"])
+features_df = features_df[features_df.vs_type.notna() & (features_df.vs_type != "")]
+lc_index = loader.get_star_index(tile, filters=[("id", "in", features_df.id.to_list())])
+
+file = open(f"patched_features_{tile}.csv", "w")
+file.write(
+    "id,vs_type,max_order_diff,max_amplitude_diff,max_phase_diff,"
+    "time_curve_fit,time_linear_fit\n"
+)
+
+n_stars = 0
+n_order_different = 0
+n_amplitude_different = 0
+total_curve_fit = 0
+total_linear_fit = 0
+for _, star in features_df.iterrows():
+    if star.id not in lc_index:
+        continue
+    lc = lc_index.get_star(star.id)
+
+    order_diff = max_order_diff(np.asarray(lc["mag"]))
+    time_curve_fit, curve_fit_result = fourier(lc, linear_fit=False)
+    time_linear_fit, linear_result = fourier(lc, linear_fit=True)
+    amplitude_diff, phase_diff = max_fourier_diffs(curve_fit_result, linear_result)
+
+    n_stars += 1
+    if order_diff > tolerance:
+        n_order_different += 1
+    if amplitude_diff > tolerance:
+        n_amplitude_different += 1
+    total_curve_fit += time_curve_fit
+    total_linear_fit += time_linear_fit
+    file.write(
+        f"{star.id},{star.vs_type},{order_diff},{amplitude_diff},{phase_diff},"
+        f"{time_curve_fit},{time_linear_fit}\n"
+    )
+
+file.close()
+print(f"OrderStatistics differs from feets in {n_order_different} of {n_stars} stars.")
+print(
+    f"linear_fit amplitudes differ from curve_fit in {n_amplitude_different} of "
+    f"{n_stars} stars. curve_fit: {total_curve_fit:.1f} s, linear_fit: "
+    f"{total_linear_fit:.1f} s "
+    f"(speedup {total_curve_fit / max(total_linear_fit, 1e-12):.1f}x)."
+)
@@ -0,0 +1,92 @@
+import numpy as np
+import sys
+import time
+import warnings
+
+from catalog.catalog_loader import CatalogLoader
+from light_curve.gp_wrapper import (
+    GeorgeGPWrapper,
+    ScikitGPWrapper,
+    TinyGPWrapper,
+    enable_compilation_cache,
+)
+from light_curve.light_curve import LightCurve
+
+warnings.filterwarnings("ignore")
+
+# Parameters.
+tile = sys.argv[1]
+# Number of classified stars compared.
+n_stars = 100
+# Phases where the predictions are compared.
+X_pred = np.linspace(0, 1, 100).reshape(-1, 1)
+# Difference in magnitudes to count the predictions as different.
+tolerance = 1e-3
+# The two-phase training of george uses a Matern32 kernel instead of the
+# periodic one, so it is not expected to match.
+backends = {
+    "george": GeorgeGPWrapper,
+    "scikit": ScikitGPWrapper,
+    "tiny": TinyGPWrapper,
+}
+# Reuse the tinygp compilations of earlier runs.
+enable_compilation_cache()
+
+
+def train(lc):
+    start = time.perf_counter()
+    lc._train()
+    seconds = time.perf_counter() - start
+    mean, std = lc.model.predict(X_pred, return_std=True)
+    return seconds, mean, std
+
+
+# Compare the classified stars of the tile.
+loader = CatalogLoader("../catalog")
+features_df = loader.get_features(tile, columns=["id", "vs_type", "PeriodLS"])
+features_df = features_df[features_df.vs_type.notna() & (features_df.vs_type != "")]
+features_df = features_df.head(n_stars)
+lc_index = loader.get_star_index(tile, filters=[("id", "in", features_df.id.to_list())])
+
+file = open(f"periodic_training_{tile}.csv", "w")
+file.write(
+    "id,vs_type,backend,max_mean_diff,max_std_diff,time_two_phases,time_periodic\n"
+)
+
+n_compared = dict.fromkeys(backends, 0)
+n_different = dict.fromkeys(backends, 0)
+total_two_phases = dict.fromkeys(backends, 0.0)
+total_periodic = dict.fromkeys(backends, 0.0)
+for _, star in features_df.iterrows():
+    if star.id not in lc_index:
+        continue
+    light_curve = lc_index.get_star(star.id)
+
+    for name, wrapper in backends.items():
+        two_phases = LightCurve(light_curve, star.PeriodLS, star.id, wrapper(0, 0))
+        periodic = LightCurve(
+            light_curve, star.PeriodLS, star.id, wrapper(0, 0, periodic=True)
+        )
+        time_two_phases, mean_two_phases, std_two_phases = train(two_phases)
+        time_periodic, mean_periodic, std_periodic = train(periodic)
+
+        mean_diff = np.max(np.abs(mean_periodic - mean_two_phases))
+        std_diff = np.max(np.abs(std_periodic - std_two_phases))
+        n_compared[name] += 1
+        if mean_diff > tolerance:
+            n_different[name] += 1
+        total_two_phases[name] += time_two_phases
+        total_periodic[name] += time_periodic
+        file.write(
+            f"{star.id},{star.vs_type},{name},{mean_diff},{std_diff},"
+            f"{time_two_phases},{time_periodic}\n"
+        )
+
+file.close()
+for name in backends:
+    print(
+        f"{name}: predictions differ in {n_different[name]} of {n_compared[name]} "
+        f"stars. Two phases: {total_two_phases[name]:.1f} s, periodic: "
+        f"{total_periodic[name]:.1f} s "
+        f"(speedup {total_two_phases[name] / max(total_periodic[name], 1e-12):.1f}x)."
+    )
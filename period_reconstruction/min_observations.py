@@ -1,7 +1,8 @@
 import carpyncho
 import numpy as np
 
-from light_curve_sampler import LightCurveSampler
+from light_curve.light_curve_sampler import LightCurveSampler
+from light_curve.periodogram import batch_lscargle
 from joblib import Parallel, delayed
 
 import warnings
@@ -13,6 +14,12 @@ warnings.filterwarnings("ignore")
 # Parameters
 tile = sys.argv[1]
 snr = 20
+# Update the periodogram as observations are removed instead of recomputing it.
+incremental = False
+# Subsample the stars of a batch together, computing their periods at every
+# step with a single batch_lscargle call. The periods are those of
+# estimate_period. Ignores incremental.
+batched = True
 
 
 def min_obs(lc):
@@ -20,12 +27,12 @@ def min_obs(lc):
     Removes observations at random from a stars lightcurve until the period is
     no longer obtainable. Then returns the smalles number for which it was.
     """
-    n_obs = len(lc.time)
+    n_obs = len(lc.hjd)
     n_sample = n_obs
     min_obs = 1
     for n_sample in range(n_obs, min_obs, -1):
         lc.subsample(n_sample)
-        lc.calculate_period()
+        lc.calculate_period(with_fap=False)
 
         if np.abs(lc.period - lc.period_catalog) >= 0.01:
             break
@@ -41,8 +48,32 @@ def min_obs(lc):
 def batch_min_obs(lc_array):
     """
     Calls min_obs on every element of lc_array and returns the result in an array.
+    With batched, the same is done for all of them at once.
     """
-    return np.array([min_obs(lc) for lc in lc_array])
+    if not batched:
+        return np.array([min_obs(lc) for lc in lc_array])
+
+    n_obs = np.array([len(lc.hjd) for lc in lc_array])
+    n_sample = n_obs.copy()
+    active = n_obs > 1
+    while active.any():
+        idx = np.flatnonzero(active)
+        for i in idx:
+            lc_array[i].subsample(n_sample[i])
+        period, _ = batch_lscargle(
+            [lc_array[i].hjd for i in idx],
+            [lc_array[i].mag for i in idx],
+            [lc_array[i].err for i in idx],
+        )
+        period_catalog = np.array([lc_array[i].period_catalog for i in idx])
+
+        # As in min_obs, a star stops when its period is lost or at 2 points.
+        done = (np.abs(period - period_catalog) >= 0.01) | (n_sample[idx] == 2)
+        active[idx[done]] = False
+        n_sample[idx[~done]] -= 1
+
+    n_original_obs = np.array([lc.n_original_obs for lc in lc_array])
+    return np.where(n_sample == n_obs, n_original_obs, n_sample)
 
 
 # Instance the client and get the b278 tile catalogs.
@@ -62,7 +93,7 @@ out_file.write("bm_src_id,vs_type,obs_threshold\n")
 lc_list = []
 for _, star in b278_features.iterrows():
     light_curve = b278_lc[b278_lc.bm_src_id == star.id]
-    lc = LightCurveSampler(light_curve, star.PeriodLS)
+    lc = LightCurveSampler(light_curve, star.PeriodLS, incremental=incremental)
     lc.filter_snr(20)
     lc_list.append(lc)
 lc_array = np.array(lc_list)
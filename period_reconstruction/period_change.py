@@ -9,31 +9,40 @@ tile = sys.argv[1]
 
 # Get the catalogs.
 loader = CatalogLoader("../catalog")
-lc_df = loader.get_lc(tile)
-features_df = loader.get_features(tile)
-
-# Filter RRLyrae from the catalogs.
 rr_lyrae = ["RRLyr-RRab", "RRLyr-RRc", "RRLyr-RRd"]
-features_df = features_df[features_df["vs_type"].isin(rr_lyrae)]
-lc_df = lc_df[lc_df.bm_src_id.isin(features_df.id.to_numpy())]
 
-file = open(f"period_synth_george_{tile}.csv", "w")
-file.write("id,n_synth,period_ls,period_fit\n")
+# Keep only the RRLyrae and their observations.
+features_df = loader.get_features(tile, filters=[("vs_type", "in", rr_lyrae)])
+lc_index = loader.get_star_index(tile, filters=[("id", "in", features_df.id.to_list())])
 
 # Parameters
 n_iter = 100
 n_add = 2
+# Arguments of narrow_band_period to search the period only around PeriodLS,
+# or None to search the whole band. With it, period_fit holds the peak power.
+narrow_band = None
+# Update the periodogram as synthetic points are added instead of recomputing it.
+incremental = False
+
+file = open(f"period_synth_george_{tile}.csv", "w")
+file.write("id,n_synth,period_ls,period_fit,drift\n")
 
 augmented_lc = pd.DataFrame()
 
 for _, star in features_df.iterrows():
-    light_curve = lc_df[lc_df.bm_src_id == star.id]
-    lc = LightCurve(light_curve, star.PeriodLS, star.id)
+    light_curve = lc_index.get_star(star.id)
+    lc = LightCurve(
+        light_curve,
+        star.PeriodLS,
+        star.id,
+        narrow_band=narrow_band,
+        incremental=incremental,
+    )
     lc.filter_snr(20)
 
     if len(lc.hjd):
         period_ls, period_fit = star.PeriodLS, star.Period_fit
-        file.write(f"{lc.id},{len(lc.synth_hjd)},{period_ls},{period_fit}\n")
+        file.write(f"{lc.id},{len(lc.synth_hjd)},{period_ls},{period_fit},0.0\n")
         for _ in range(n_iter):
             lc.add_synthetic(n_add)
             period_ls, period_fit = lc.make_periodic()
@@ -41,7 +50,10 @@ for _, star in features_df.iterrows():
             if np.isnan(period_ls):
                 break
 
-            file.write(f"{lc.id},{len(lc.synth_hjd)},{period_ls},{period_fit}\n")
+            drift = period_ls / star.PeriodLS - 1
+            file.write(
+                f"{lc.id},{len(lc.synth_hjd)},{period_ls},{period_fit},{drift}\n"
+            )
         augmented_lc = augmented_lc.append(lc.to_dataframe())
 
 augmented_lc.to_csv(f"augmented_{tile}_george_snr20.csv", index=False)
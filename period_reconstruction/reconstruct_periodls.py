@@ -5,13 +5,13 @@ from catalog.catalog_loader import CatalogLoader
 
 # Get the catalogs.
 loader = CatalogLoader("../catalog")
-b278_lc = loader.get_lc("b278")
-b278_features = loader.get_features("b278")
-
-# Filter RRLyraes from the catalogs.
 rr_lyrae = ["RRLyr-RRab", "RRLyr-RRc", "RRLyr-RRd"]
-b278_features = b278_features[b278_features["vs_type"].isin(rr_lyrae)]
-b278_lc = b278_lc[b278_lc.bm_src_id.isin(b278_features.id.to_numpy())]
+
+# Keep only the RRLyraes and their observations.
+b278_features = loader.get_features("b278", filters=[("vs_type", "in", rr_lyrae)])
+b278_lc = loader.get_star_index(
+    "b278", filters=[("id", "in", b278_features.id.to_list())]
+)
 
 min_obs_df = pd.read_csv("../data/min_obs_b278_snr20.csv")
 
@@ -23,11 +23,14 @@ file.write("id,PeriodLS,reconstructed,period_fit\n")
 # Parameters.
 n_iter = 20
 n_synthetic = 1
+# Arguments of narrow_band_period to search the period only around PeriodLS,
+# or None to search the whole band. With it, period_fit holds the peak power.
+narrow_band = None
 
 for _, star in b278_features.iterrows():
-    light_curve = b278_lc[b278_lc.bm_src_id == star.id]
+    light_curve = b278_lc.get_star(star.id)
     min_obs = min_obs_df.loc[min_obs_df.bm_src_id == star.id, "obs_threshold"].item()
-    lc = LightCurve(light_curve, star.PeriodLS)
+    lc = LightCurve(light_curve, star.PeriodLS, narrow_band=narrow_band)
     lc.filter_snr(20)
     if len(lc.hjd) > 5:
         n_stars += 1
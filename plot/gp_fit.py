@@ -3,6 +3,7 @@ import numpy as np
 
 from filtered.filtered_loader import FilteredLoader
 from catalog.catalog_loader import CatalogLoader
+from catalog.tile_cache import TileCache
 from light_curve.light_curve import LightCurve
 from light_curve.gp_wrapper import GeorgeGPWrapper, TinyGPWrapper, ScikitGPWrapper
 from PyAstronomy.pyasl import foldAt
@@ -63,16 +64,14 @@ def plot_gp(
     return ax
 
 
-cl = CatalogLoader("../catalog")
-lc = cl.get_lc("b278")
-features = cl.get_features("b278")
-
+# Keep the parsed catalogs on disk, so re-running the script skips parsing them.
+cl = CatalogLoader("../catalog", cache=TileCache(path="../cache"))
 rr_lyrae = ["RRLyr-RRab", "RRLyr-RRc", "RRLyr-RRd"]
-features = features[features["vs_type"].isin(rr_lyrae)]
+features = cl.get_features("b278", filters=[("vs_type", "in", rr_lyrae)])
 
 # star = features.loc[features["cnt"].idxmax()]
 star = features.iloc[8]
-light_curve = lc[lc.id == star.id]
+light_curve = cl.get_lc("b278", filters=[("id", "==", star.id)])
 
 lc = LightCurve(light_curve, star.PeriodLS, star.id, model=TinyGPWrapper(0, 0, 0))
 # lc = LightCurve(light_curve, star.PeriodLS, star.id, model=ScikitGPWrapper())
@@ -4,6 +4,7 @@ import pandas as pd
 import sys
 
 from catalog.catalog_loader import CatalogLoader
+from catalog.tile_store import prefetch_tiles
 
 gp_lib = sys.argv[1]
 
@@ -13,9 +14,13 @@ tile_list = loader.list_tiles()
 # The data goes from 0 to 200 synthetic points with a step size of 2.
 n_steps = 100 + 1
 
-for ax, tile in zip(axs.flatten(), tile_list):
-    df = pd.read_csv(f"../data/period_synth_{gp_lib}_{tile}.csv")
 
+def read_period_synth(tile):
+    return pd.read_csv(f"../data/period_synth_{gp_lib}_{tile}.csv")
+
+
+# Read the next tile while the current one is processed.
+for ax, (tile, df) in zip(axs.flatten(), prefetch_tiles(read_period_synth, tile_list)):
     squared_err = np.zeros(n_steps)
     count = np.zeros(n_steps)
     for id in df["id"]: